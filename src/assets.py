@@ -0,0 +1,132 @@
+import re
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pygame
+
+from src.constants import TEXT_CACHE_SIZE
+from src.tracing import tracer
+
+
+class DerivedImageCache:
+    """
+    Mask, hit-flash overlay and collision radius derived from a source image, computed once per image and shared by
+    every sprite using that image (the images come from shared banks, e.g. EnemyImages). Entries go away with their
+    source surface.
+    """
+
+    def __init__(self):
+        self.entries = weakref.WeakKeyDictionary()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    def get(self, image, hit_color):
+        """
+        Returns (mask, hit_image, radius) for image. The mask and hit image are shared, so they must not be modified.
+        """
+        per_color = self.entries.setdefault(image, {})
+        entry = per_color.get(hit_color)
+        if entry is None:
+            self.misses += 1
+            with tracer.span('derived image', 'asset'):
+                mask = pygame.mask.from_surface(image, threshold=0)
+                # Copy original image and add an transparent mask on top for the hit:
+                hit_image = image.copy()
+                hit_image.blit(mask.to_surface(setcolor=hit_color, unsetcolor=None).convert_alpha(), (0, 0))
+                radius = mask_radius(mask)
+            entry = per_color[hit_color] = (mask, hit_image, radius)
+        else:
+            self.hits += 1
+            width, height = image.get_size()
+            self.bytes_saved += width * height * image.get_bytesize() + (width * height + 7) // 8
+        return entry
+
+    def clear(self):
+        self.entries.clear()
+
+    def __str__(self):
+        return (f"Derived images: {self.hits} hits, {self.misses} misses, "
+                f"{self.bytes_saved / 1024 / 1024:.1f} MB not allocated")
+
+
+def mask_radius(mask):
+    """
+    Radius of the smallest circle around the rect center (as placed by get_rect) containing all the set pixels of
+    mask, so that a circle test never misses a hit of the mask test.
+    """
+    width, height = mask.get_size()
+    xs, ys = np.nonzero(pygame.surfarray.array_red(mask.to_surface()))
+    if not len(xs):
+        return 0.0
+    # farthest corner of each pixel from the center:
+    dx = np.maximum(np.abs(xs - width // 2), np.abs(xs + 1 - width // 2))
+    dy = np.maximum(np.abs(ys - height // 2), np.abs(ys + 1 - height // 2))
+    return float(np.sqrt(np.max(dx * dx + dy * dy)))
+
+
+derived_images = DerivedImageCache()
+
+
+class TextCache:
+    """
+    Rendered text surfaces keyed by font, string, antialiasing and color, the least recently used dropped first. A
+    string with numbers missing from the cache is put together from cached glyphs (each digit, and the text between
+    the numbers) rather than rendered, so a changing score costs a few blits once and a single blit while unchanged.
+    """
+
+    def __init__(self, size=TEXT_CACHE_SIZE):
+        self.size = size
+        self.surfaces = OrderedDict()
+        self.glyphs = {}
+        self.hits = 0
+        self.misses = 0
+        self.composed = 0
+
+    def render(self, font, text, antialias, color):
+        # Same as font.render, the surface returned is shared so it must not be modified
+        key = font, text, antialias, tuple(color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        if any(char.isdigit() for char in text):
+            surface = self.compose(font, text, antialias, color)
+        else:
+            surface = font.render(text, antialias, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.size:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def compose(self, font, text, antialias, color):
+        self.composed += 1
+        atlas = self.glyphs.setdefault((font, antialias, tuple(color)), {})
+        surface = pygame.Surface(font.size(text), pygame.SRCALPHA)
+        x = 0
+        for run in re.findall(r'\d|\D+', text):
+            glyph = atlas.get(run)
+            if glyph is None:
+                # Placed by their advance, glyphs like '/' overhang into the next one:
+                advance = sum(metrics[4] for metrics in font.metrics(run))
+                glyph = atlas[run] = font.render(run, antialias, color), advance
+            image, advance = glyph
+            surface.blit(image, (x, 0))
+            x += advance
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+        self.glyphs.clear()
+
+    def __str__(self):
+        lookups = self.hits + self.misses
+        return (f"Text cache: {self.hits} hits, {self.misses} misses ({self.hits / max(lookups, 1):.1%} hit rate), "
+                f"{self.composed} built from glyphs")
+
+
+text_cache = TextCache()
@@ -1,10 +1,14 @@
+import itertools
 import math
 import random
 
 import numpy as np
 import pygame
 from src.constants import GameState, STATUS_BAR_HEIGHT, NEXT_LEVEL_EVENT, \
-    HEALTH_BAR_WIDTH, HEALTH_BAR_HEIGHT, BG_SPEED, PLANET_EVENT, ANCHORED_OFFSET_EVENT, SPACESHIP_DESTROYED
+    HEALTH_BAR_HEIGHT, BG_SPEED, PLANET_EVENT, ANCHORED_OFFSET_EVENT, SPACESHIP_DESTROYED, \
+    COLLISION_BACKEND, MAX_INTERPOLATION_DISTANCE, PROFILER_KEY, TRACE_KEY, \
+    SPACESHIP_DRAW_MARGIN, STATUS_TEXT_HEIGHT, BG_COLOR, BG_COMPOSITE_LAYERS, BG_COMPOSITE_CACHE_SIZE, \
+    BG_RLE_MAX_COVERAGE, RENDER_SIZE, RENDER_SCALING
 from src.flying_obj import Planet, Explosion, FlyingObject
 from src.enemies import Asteroid, Swarmer, Gem, SineShip
 from src.hero import Spaceship
@@ -12,18 +16,39 @@ from src.upgrades import UpgradeType
 from src.levels import LevelController
 from src.moves import SpriteMoves
 from src.enemy_spawner import EnemySpawner
-from src.utils import scale_and_rotate, group_two_pass_collision, sprite_two_pass_collision
+from src.utils import scale_and_rotate
+from src.collision_world import CollisionWorld
+from src.kinematics import kinematics
+from src.timestep import FixedTimestep
+from src.timers import event_timers
+from src.controls import KeyboardInput
+from src.profiler import profiler
+from src.tracing import tracer, traced
+from src.renderer import DirtyRectRenderer, ScaledDisplay
+from src.assets import text_cache
 from src import gradient
 
 
 class Game:
-    def __init__(self):
+    def __init__(self, collision_backend=COLLISION_BACKEND, controls=None, window_size=None, seed=None,
+                 dirty_rects=False, render_size=RENDER_SIZE, scaling=RENDER_SCALING):
         # init pygame:
         # Set the dimensions of the window
         # pygame.display.set_caption("Spaceship Simulation")
         pygame.init()
-        self.window = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+        # All the gameplay randomness comes from this generator, so a seed and the inputs replay a game exactly:
+        self.seed = random.randrange(2 ** 32) if seed is None else seed
+        self.rng = random.Random(self.seed)
+        if window_size is None:
+            self.window = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+        else:
+            self.window = pygame.display.set_mode(window_size)
         # self.window = pygame.display.set_mode((1200, 800))
+        # Everything is drawn (and played) at the render size, scaled to the window when presented:
+        self.scaled_display = None
+        if render_size is not None and tuple(render_size) != self.window.get_size():
+            self.scaled_display = ScaledDisplay(self.window, render_size, scaling)
+            self.window = self.scaled_display.surface
 
         self.width = self.window.get_width()
         self.height = self.window.get_height()
@@ -33,18 +58,26 @@ class Game:
 
         self.status_font = pygame.font.Font('assets/fonts/Grand9K Pixel.ttf', 24)
         self.title_font = pygame.font.Font('assets/fonts/Grand9K Pixel.ttf', 64)
-        self.background = Background(self.window)
+        self.background = Background(self.window, self.rng)
+        self.health_bar = HealthBar(self.window)
+        self.renderer = DirtyRectRenderer(self) if dirty_rects else None
 
         self.clock = pygame.time.Clock()
+        self.collision_backend = collision_backend
+        self.controls = controls or KeyboardInput()
+        # Trace captures started by the key also run cProfile:
+        self.trace_cprofile = False
         self.start_up()
 
     def start_up(self):
+        kinematics.clear()
         self.state_manager = GameStateManager(self, GameState.START_SCREEN, self.window)
 
         self.effects = pygame.sprite.Group()
         self.sprite_moves = SpriteMoves()
+        self.collision_world = CollisionWorld(self, self.collision_backend)
 
-        self.spaceship = Spaceship(100, 100, self.sprite_moves)
+        self.spaceship = Spaceship(100, 100, self.sprite_moves, self.controls)
         self.level_controller = LevelController(self)
 
         # enemy spawn:
@@ -60,70 +93,95 @@ class Game:
         self.next_upgrade = self.calc_next_upgrade()
 
         self.game_time = 0
+        self.previous_centers = {}
 
     def calc_next_upgrade(self):
         return self.upgrade_level * (self.upgrade_level + 1) * 100
 
     def create_explosion(self, x, y, size):
-        explosion = Explosion.create(x, y, size)
+        explosion = Explosion.create(x, y, size, self.rng)
         self.effects.add(explosion)
 
-    def check_projectile_hits(self, projectiles, kill_projectile=True):
-        # Projectile hits:
-        hits = group_two_pass_collision(self.enemy_spawner.enemy_ships, projectiles, False, kill_projectile)
-        if hits:
-            for enemy, projectiles in hits.items():
-                damage = 0
-                for projectile in projectiles:
-                    damage += projectile.damage
-                destroyed = enemy.got_hit(damage=damage)
-                if destroyed:
-                    self.enemy_destroyed(enemy)
+    def check_collisions(self, spaceship_collisions=True):
+        # Handlers in the original check order, each one right after its own query, so that the enemies and gems
+        # spawned by a handler are collided by the next queries in the same frame.
+        world = self.collision_world
+        profiler.begin('detect')
+        world.build()
+        profiler.end('detect')
+        self.handle_hits('projectiles', world.projectile_hits, self.check_projectile_hits)
+        if not spaceship_collisions:
+            return
+
+        if self.spaceship.health > 0:
+            self.handle_hits('spaceship', world.spaceship_hits, self.check_spaceship_collisions)
+            self.handle_hits('spaceship', world.gem_hits, self.check_gem_pickups)
+        profiler.begin('spaceship')
+        self.check_spaceship_border_hit()
+        profiler.end('spaceship')
 
-    def check_spaceship_collisions(self):
+        # Check shields:
+        self.handle_hits('shields', world.rotating_shield_hits, self.check_rotating_shield_hits)
+        if self.spaceship.weapons.shield.current_shield > 0:
+            self.handle_hits('shields', world.shield_hits, self.check_shield_hits)
+
+    def handle_hits(self, stage, query, handler):
+        # The query is timed as detection, after indexing the enemies spawned by the previous handlers:
+        profiler.begin('detect')
+        self.collision_world.index_spawned()
+        hits = query()
+        profiler.end('detect')
+        profiler.begin(stage)
+        handler(hits)
+        profiler.end(stage)
+
+    def check_projectile_hits(self, hits):
+        # Projectile hits:
+        for enemy, projectiles in hits.items():
+            damage = 0
+            for projectile in projectiles:
+                damage += projectile.damage
+            destroyed = enemy.got_hit(damage=damage)
+            if destroyed:
+                self.enemy_destroyed(enemy)
+
+    def check_spaceship_collisions(self, hits):
         # Spaceship collisions:
-        hits = sprite_two_pass_collision(self.spaceship, self.enemy_spawner.all_enemies, False)
-        if hits:
-            for enemy in hits:
-                destroyed = enemy.ship_collide(self.spaceship)
-                self.spaceship.hit_cooldown = self.spaceship.hit_cooldown_time
+        for enemy in hits:
+            if not enemy.alive():
+                continue
+            destroyed = enemy.ship_collide(self.spaceship)
+            self.spaceship.hit_cooldown = self.spaceship.hit_cooldown_time
+            if destroyed:
+                self.enemy_destroyed(enemy)
+
+    def check_gem_pickups(self, hits):
+        self.score += self.enemy_spawner.gem_system.collect(hits)
+
+    def check_rotating_shield_hits(self, hits):
+        for shield, enemies in hits.items():
+            for enemy in enemies:
+                if shield.health <= 0 or not enemy.alive():
+                    continue
+                damage = min(shield.damage, enemy.health)
+                shield.health -= damage
+                destroyed = enemy.got_hit(damage=damage)
                 if destroyed:
                     self.enemy_destroyed(enemy)
+            if shield.health <= 0:
+                self.spaceship.weapons.kill_rotating_shield(shield)
 
-        # GEMS:
-        hits = sprite_two_pass_collision(self.spaceship, self.enemy_spawner.gems, False)
-        if hits:
-            for gem in hits:
-                gem.kill()
-                self.score += gem.score
-
-    def check_rotating_shield_hits(self):
-        hits = group_two_pass_collision(self.spaceship.weapons.rotating_shields, self.enemy_spawner.enemy_ships, False,
-                                        False)
-        if hits:
-            for shield, enemies in hits.items():
-                for enemy in enemies:
-                    if shield.health <= 0:
-                        continue
-                    damage = min(shield.damage, enemy.health)
-                    shield.health -= damage
-                    destroyed = enemy.got_hit(damage=damage)
-                    if destroyed:
-                        self.enemy_destroyed(enemy)
-                if shield.health <= 0:
-                    self.spaceship.weapons.kill_rotating_shield(shield)
-
-    def check_shield_hits(self):
+    def check_shield_hits(self, hits):
         shield = self.spaceship.weapons.shield
         # Shield collisions:
-        hits = sprite_two_pass_collision(shield, self.enemy_spawner.all_enemies, False)
-        if hits:
-            for enemy in hits:
-                shield.current_shield -= 1
-                shield.shield_recharge = shield.shield_recharge_time
-                destroyed = enemy.got_hit(damage=shield.collision_damage)
-                if destroyed:
-                    self.enemy_destroyed(enemy)
+        for enemy in hits:
+            if not enemy.alive():
+                continue
+            shield.current_shield -= 1
+            shield.shield_recharge = shield.shield_recharge_time
+            destroyed = enemy.got_hit(damage=shield.collision_damage)
+            if destroyed:
+                self.enemy_destroyed(enemy)
 
     def enemy_destroyed(self, enemy):
         # Explosion depending on the size:
@@ -134,7 +192,7 @@ class Game:
             self.enemy_spawner.spawn_smaller_asteroids(enemy)
         # Gem: each enemy might spawn a different type at some point. For now all the same
         if type(enemy) == Swarmer:
-            if random.random() < 0.3:
+            if self.rng.random() < 0.3:
                 self.enemy_spawner.spawn_gem(enemy.x, enemy.y)
         if type(enemy) == Asteroid and enemy.size == 1:
             self.enemy_spawner.spawn_gem(enemy.x, enemy.y)
@@ -143,7 +201,15 @@ class Game:
             self.enemy_spawner.spawn_gem(enemy.x, enemy.y, level=2)
 
     def event_handling(self):
-        for event in pygame.event.get():
+        events = pygame.event.get()
+        for event in events:
+            # Not a player input, live even when replaying:
+            if event.type == pygame.KEYDOWN and event.key == PROFILER_KEY:
+                profiler.overlay = not profiler.overlay
+            if event.type == pygame.KEYDOWN and event.key == TRACE_KEY:
+                tracer.start(with_cprofile=self.trace_cprofile)
+
+        for event in self.controls.events(events):
             if event.type == pygame.QUIT:
                 self.state_manager.game_state = GameState.QUIT
 
@@ -205,77 +271,118 @@ class Game:
         pygame.draw.rect(self.window, pygame.Color('cadetblue2'),
                          pygame.rect.Rect(0, STATUS_BAR_HEIGHT, self.window.get_width(), 3))
 
-        score_text = self.status_font.render(
-            f"Score: {self.score}/{self.next_upgrade}", True, pygame.Color('chartreuse3'))
+        score_text = text_cache.render(
+            self.status_font, f"Score: {self.score}/{self.next_upgrade}", True, pygame.Color('chartreuse3'))
         self.window.blit(score_text, (10, 10))
 
-        score_text = self.status_font.render(
-            f"Level: {self.level_controller.current_level}", True, pygame.Color('chartreuse3'))
+        score_text = text_cache.render(
+            self.status_font, f"Level: {self.level_controller.current_level}", True, pygame.Color('chartreuse3'))
         self.window.blit(score_text, (self.width // 2 - 50, 10))
         #
-        score_text = self.status_font.render(f"FPS:{self.clock.get_fps():.0f}", True, pygame.Color('chartreuse3'))
+        score_text = text_cache.render(
+            self.status_font, f"FPS:{self.clock.get_fps():.0f}", True, pygame.Color('chartreuse3'))
         self.window.blit(score_text, (self.width - 100, 10))
 
         # Spaceship health:
-        HEALTH_BAR_WIDTH = self.spaceship.max_health
-        health_pos_top = self.height - HEALTH_BAR_HEIGHT - 5
-        health_pos_left = (self.width - HEALTH_BAR_WIDTH) // 2
-
-        pygame.draw.rect(self.window, pygame.Color('gray40'),
-                         pygame.rect.Rect(health_pos_left - 1, health_pos_top - 1, HEALTH_BAR_WIDTH + 2,
-                                          HEALTH_BAR_HEIGHT + 2), border_radius=0)
-
-        pygame.draw.rect(self.window, pygame.Color('red'),
-                         pygame.rect.Rect(health_pos_left, health_pos_top, HEALTH_BAR_WIDTH, HEALTH_BAR_HEIGHT))
-
-        health_size = round(self.spaceship.health) # /  * HEALTH_BAR_WIDTH)
-        damage_size = round((self.spaceship.health_bar - self.spaceship.health) / 100 * HEALTH_BAR_WIDTH)
-        health_pos = health_size + health_pos_left
-
-        health_gain_pos = round(self.spaceship.health_bar / 100 * HEALTH_BAR_WIDTH) + health_pos_left
-        health_gain_size = health_pos - health_gain_pos
-
-        # pygame.draw.rect(self.window, pygame.Color('gray'),
-        #                  pygame.rect.Rect(health_pos, 10, W - health_size, 15))
-
-        if self.spaceship.health < self.spaceship.max_health:
-            self.window.blit(
-                gradient.horizontal((HEALTH_BAR_WIDTH - health_size, HEALTH_BAR_HEIGHT), pygame.Color('gray60'),
-                                    pygame.Color('gray30')),
-                (health_pos, health_pos_top))
-
-        if self.spaceship.health_bar > self.spaceship.health:
-            # pygame.draw.rect(self.window, pygame.Color('orange1'),
-            #                  pygame.rect.Rect(health_pos, TOP, damage_size, H))
-            self.window.blit(
-                gradient.horizontal((damage_size, HEALTH_BAR_HEIGHT), pygame.Color('red'), pygame.Color('yellow')),
-                (health_pos, health_pos_top))
-        # if self.spaceship.health_bar < self.spaceship.health:
-        #     self.window.blit(gradient.horizontal((health_gain_size, HEALTH_BAR_HEIGHT),
-        #                                          pygame.Color('red'), pygame.Color('blue')),
-        #                      (health_gain_pos, health_pos_top))
+        self.health_bar.draw(self.spaceship)
 
     # Draws an "action" (running state) frame
-    def draw_action(self, add_scroll=True, spaceship=True):
-        self.background.update_and_draw(add_scroll)
+    def draw_action(self, spaceship=True, alpha=1.0):
+        moved = self.interpolate_positions(alpha)
+        if self.renderer is None:
+            self.background.draw()
+        else:
+            self.renderer.draw_background(self.dirty_regions(spaceship))
         self.enemy_spawner.all_enemies.draw(self.window)
         self.enemy_spawner.gems.draw(self.window)
         self.effects.draw(self.window)
         if spaceship:
             self.spaceship.draw(self.window)
         self.draw_status()
+        if profiler.overlay:
+            profiler.draw(self.window)
+        self.restore_positions(moved)
+
+    def dirty_regions(self, spaceship=True):
+        # Rects of everything draw_action draws over the background
+        sprites = itertools.chain(self.moving_sprites(), self.effects) if spaceship else \
+            itertools.chain(self.enemy_spawner.all_enemies, self.enemy_spawner.gems, self.effects)
+        regions = [sprite.rect.union(sprite.image.get_rect(topleft=sprite.rect.topleft)) for sprite in sprites]
+        if spaceship:
+            # Thrusters and shadow trail around the ship:
+            ship = self.spaceship
+            regions.append(ship.rect.inflate(SPACESHIP_DRAW_MARGIN, SPACESHIP_DRAW_MARGIN).union(ship.trail.rect()))
+        # Status texts and health bar:
+        regions.append(pygame.Rect(0, 0, self.width, STATUS_TEXT_HEIGHT))
+        regions.append(pygame.Rect(0, self.height - HEALTH_BAR_HEIGHT - 6, self.width, HEALTH_BAR_HEIGHT + 6))
+        if profiler.overlay and profiler.panel_rect is not None:
+            regions.append(profiler.panel_rect)
+        return regions
+
+    def entity_counts(self):
+        return dict(enemies=len(self.enemy_spawner.all_enemies), gems=len(self.enemy_spawner.gems),
+                    projectiles=len(self.spaceship.weapons.projectiles), effects=len(self.effects),
+                    bodies=int(kinematics.alive.sum()))
+
+    def moving_sprites(self):
+        weapons = self.spaceship.weapons
+        return itertools.chain(self.enemy_spawner.all_enemies, self.enemy_spawner.gems, weapons.projectiles,
+                               weapons.wingmen, weapons.rotating_shields, weapons.shield_group, [self.spaceship])
+
+    def snapshot_positions(self):
+        # Positions before the last tick of the frame, the drawing is interpolated from them:
+        self.previous_centers = {sprite: sprite.rect.center for sprite in self.moving_sprites()}
+
+    def interpolate_positions(self, alpha):
+        # Moves the rects between the last two ticks just for the drawing, returns the centers to restore
+        moved = []
+        if alpha >= 1.0:
+            return moved
+        previous_centers = self.previous_centers
+        for sprite in self.moving_sprites():
+            previous = previous_centers.get(sprite)
+            if previous is None:
+                continue
+            center = sprite.rect.center
+            dx = center[0] - previous[0]
+            dy = center[1] - previous[1]
+            # Nothing to do if still, and no sliding for sprites that jumped (e.g. a pooled sprite reused elsewhere):
+            if (dx == 0 and dy == 0) or abs(dx) + abs(dy) > MAX_INTERPOLATION_DISTANCE:
+                continue
+            moved.append((sprite, center))
+            sprite.rect.center = round(previous[0] + alpha * dx), round(previous[1] + alpha * dy)
+        return moved
+
+    @staticmethod
+    def restore_positions(moved):
+        for sprite, center in moved:
+            sprite.rect.center = center
 
     def state(self):
         return self.state_manager.game_state
 
     def update_sprites(self):
-        self.spaceship.update()
-        self.effects.update()
-        self.enemy_spawner.all_enemies.update()
-        self.enemy_spawner.gems.update()
+        with tracer.span('background', 'update'):
+            self.background.update()
+        with tracer.span('spaceship', 'update'):
+            self.spaceship.update()
+        with tracer.span('effects', 'update'):
+            self.effects.update()
+        with tracer.span('enemies', 'update'):
+            self.enemy_spawner.all_enemies.update()
+        with tracer.span('gems', 'update'):
+            self.enemy_spawner.gems.update()
+        with tracer.span('systems', 'update'):
+            self.enemy_spawner.swarm_system.update()
+            self.enemy_spawner.gem_system.update(self.spaceship)
+            self.enemy_spawner.homing_system.update()
+        # Moves everything scheduled by the updates above at once:
+        with tracer.span('kinematics', 'update'):
+            kinematics.step()
 
         # Custom sprite moves:
-        self.sprite_moves.update()
+        with tracer.span('sprite moves', 'update'):
+            self.sprite_moves.update()
 
     def manage_game_state(self, dt):
         self.state_manager.manage_game_state(dt)
@@ -329,13 +436,15 @@ class GameStateManager:
         self.game = game
         self.game_state = game_state
         self.window = window
+        self.timestep = FixedTimestep()
 
+    @traced('state')
     def manage_game_state(self, dt):
         if self.game_state == GameState.TEST:
             self.test_stuff()
 
         if self.game_state == GameState.GAME_OVER:
-            self.game_over_state()
+            self.game_over_state(dt)
 
         if self.game_state == GameState.UPGRADE:
             self.upgrade_screen_state()
@@ -344,46 +453,69 @@ class GameStateManager:
             self.start_screen_state()
 
         if self.game_state == GameState.RUNNING:
-            self.game_running_state()
-            self.game.game_time += dt
-
+            self.game_running_state(dt)
+
+    def run_ticks(self, dt, tick, game_state):
+        # Runs the simulation ticks due for this frame, stopping if a tick changes the state, and returns how many ran
+        ticks = self.timestep.advance(dt)
+        for idx in range(ticks):
+            if self.game_state != game_state:
+                return idx
+            if idx == ticks - 1:
+                self.game.snapshot_positions()
+            tick()
+        return ticks
+
+    def check_upgrade(self):
         # Upgrade by points:
         if self.game.score >= self.game.next_upgrade and self.game_state == GameState.RUNNING:
             self.game_state = GameState.UPGRADE
             self.game.upgrade_level += 1
             self.game.next_upgrade = self.game.calc_next_upgrade()
 
+    @traced('state')
     def upgrade_screen_state(self):
-        self.game.draw_action(add_scroll=False)
-        txt = self.game.title_font.render("Upgrade time!", False, pygame.Color('chartreuse3'))
+        self.game.draw_action()
+        txt = text_cache.render(self.game.title_font, "Upgrade time!", False, pygame.Color('chartreuse3'))
         rect = txt.get_rect(center=(self.window.get_width() / 2, 150))
         self.game.window.blit(txt, rect)
         txt_x = rect.left + 50
         txt_y = 250
         # Choose upgrades:
-        if self.upgrade_choices is None:
-            N_CHOICES = 9
-            self.upgrade_choices = dict(
-                zip([pygame.K_1 + idx for idx in range(N_CHOICES)], random.sample(list(UpgradeType), N_CHOICES)))
+        upgrade_choices = self.upgrade_options()
 
-        for idx, upgrade in self.upgrade_choices.items():
-            txt = self.game.status_font.render(f"{idx - 48}: {upgrade.value}", False, pygame.Color('chartreuse3'))
+        for idx, upgrade in upgrade_choices.items():
+            txt = text_cache.render(self.game.status_font, f"{idx - 48}: {upgrade.value}", False,
+                                    pygame.Color('chartreuse3'))
             rect = txt.get_rect(midleft=(txt_x, txt_y))
             txt_y += 50
             self.game.window.blit(txt, rect)
-        for event in pygame.event.get():
+        events = pygame.event.get()
+        for event in events:
             if event.type == pygame.QUIT:
                 self.game_state = GameState.QUIT
-            if event.type == pygame.KEYDOWN:
-                if event.key in self.upgrade_choices:
-                    print(f"Selected {self.upgrade_choices[event.key]}")
-                    self.game.spaceship.upgrade(self.upgrade_choices[event.key])
-                    self.game_state = GameState.RUNNING
-                    self.upgrade_choices = None
+        upgrade = self.game.controls.choose_upgrade(events, upgrade_choices)
+        if upgrade is not None:
+            self.select_upgrade(upgrade)
+
+    def upgrade_options(self):
+        # Keys to the upgrades offered, drawn once per upgrade screen
+        if self.upgrade_choices is None:
+            N_CHOICES = 9
+            self.upgrade_choices = dict(
+                zip([pygame.K_1 + idx for idx in range(N_CHOICES)], self.game.rng.sample(list(UpgradeType), N_CHOICES)))
+        return self.upgrade_choices
+
+    def select_upgrade(self, upgrade):
+        print(f"Selected {upgrade}")
+        self.game.spaceship.upgrade(upgrade)
+        self.game_state = GameState.RUNNING
+        self.upgrade_choices = None
 
+    @traced('state')
     def start_screen_state(self):
         self.game.background.update_and_draw()
-        txt = self.game.title_font.render("Press Space Bar to Start!", False, pygame.Color('chartreuse3'))
+        txt = text_cache.render(self.game.title_font, "Press Space Bar to Start!", False, pygame.Color('chartreuse3'))
         rect = txt.get_rect(center=(self.game.width / 2, self.game.height / 2))
         self.game.window.blit(txt, rect)
         for event in pygame.event.get():
@@ -393,43 +525,48 @@ class GameStateManager:
                 if event.key == pygame.K_SPACE:
                     self.game_state = GameState.RUNNING
 
-    def game_running_state(self):
+    @traced('state')
+    def game_running_state(self, dt):
+        # The game time is the simulated time (same as the headless runner), not the real time of the frames:
+        self.game.game_time += self.run_ticks(dt, self.running_tick, GameState.RUNNING) * self.timestep.step
+        # Draw screen:
+        profiler.begin('draw')
+        self.game.draw_action(alpha=self.timestep.alpha)
+        profiler.end('draw')
+
+    @traced('state')
+    def running_tick(self):
+        # Timers and input for this tick:
+        profiler.begin('events')
+        event_timers.tick()
+        self.game.controls.tick()
+
         # Event handling
         self.game.event_handling()
+        profiler.end('events')
 
         # Sprite group updates:
+        profiler.begin('update')
         self.game.update_sprites()
+        profiler.end('update')
 
         # Check collisions:
-        self.game.check_projectile_hits(self.game.spaceship.weapons.projectiles)
-        if self.game.spaceship.health > 0:
-            self.game.check_spaceship_collisions()
-
-        self.game.check_spaceship_border_hit()
-
-        # Check shields:
-        self.game.check_rotating_shield_hits()
-        if self.game.spaceship.weapons.shield.current_shield > 0:
-            self.game.check_shield_hits()
+        self.game.check_collisions()
 
         # Kill sprites outside of screen:
+        profiler.begin('offbound')
         self.game.kill_all_offbound_sprites()
-        # Draw screen:
-        self.game.draw_action()
-
-    def game_over_state(self):
-        # Sprite group updates:
-        self.game.update_sprites()
+        profiler.end('offbound')
 
-        # Check collisions:
-        self.game.check_projectile_hits(self.game.spaceship.weapons.projectiles)
+        self.check_upgrade()
 
-        # Kill sprites outside of screen:
-        self.game.kill_all_offbound_sprites()
+    @traced('state')
+    def game_over_state(self, dt):
+        self.run_ticks(dt, self.game_over_tick, GameState.GAME_OVER)
         # Draw screen:
-        self.game.draw_action()
+        self.game.draw_action(alpha=self.timestep.alpha)
 
-        txt = self.game.title_font.render("YOU'RE DEAD !!!!", False, pygame.Color('chartreuse3'))
+        txt = text_cache.render(self.game.title_font, "YOU'RE DEAD !!!!", False, pygame.Color('chartreuse3'))
         rect = txt.get_rect(center=(self.game.width / 2, self.game.height / 2))
         self.game.window.blit(txt, rect)
         for event in pygame.event.get():
@@ -440,6 +577,19 @@ class GameStateManager:
                     self.game.start_up()
                     self.game_state = GameState.RUNNING
 
+    @traced('state')
+    def game_over_tick(self):
+        self.game.controls.tick()
+
+        # Sprite group updates:
+        self.game.update_sprites()
+
+        # Check collisions:
+        self.game.check_collisions(spaceship_collisions=False)
+
+        # Kill sprites outside of screen:
+        self.game.kill_all_offbound_sprites()
+
 
 
 
@@ -454,44 +604,144 @@ class Particle(FlyingObject):
         pass
 
 
-class Background:
+class HealthBar:
+    """
+    Health of the spaceship at the bottom of the screen: red up to the health, then the damage just taken (catching
+    up with the health one unit per tick) over the missing health. The gradient strips are rendered once per max
+    health, the bar shows parts of them and is only put together again when the health or the damage shown change.
+    """
+
     def __init__(self, window):
+        self.window = window
+        self.max_health = None
+        self.missing_strip = None
+        self.damage_strip = None
+        self.bar = None
+        self.shown = None
+
+    def render_strips(self, max_health):
+        self.max_health = max_health
+        size = (max_health, HEALTH_BAR_HEIGHT)
+        self.missing_strip = gradient.horizontal(size, pygame.Color('gray60'), pygame.Color('gray30'))
+        self.damage_strip = gradient.horizontal(size, pygame.Color('red'), pygame.Color('yellow'))
+        # With a 1 pixel border:
+        self.bar = pygame.Surface((max_health + 2, HEALTH_BAR_HEIGHT + 2)).convert()
+        self.shown = None
+
+    def draw(self, spaceship):
+        width = spaceship.max_health
+        if width != self.max_health:
+            self.render_strips(width)
+
+        health_size = min(max(round(spaceship.health), 0), width)
+        damage_size = 0
+        if spaceship.health_bar > spaceship.health:
+            damage_size = round((spaceship.health_bar - spaceship.health) / 100 * width)
+        if (health_size, damage_size) != self.shown:
+            self.shown = health_size, damage_size
+            self.bar.fill(pygame.Color('gray40'))
+            self.bar.fill(pygame.Color('red'), pygame.Rect(1, 1, width, HEALTH_BAR_HEIGHT))
+            self.bar.blit(self.missing_strip, (1 + health_size, 1),
+                          pygame.Rect(health_size, 0, width - health_size, HEALTH_BAR_HEIGHT))
+            self.bar.blit(self.damage_strip, (1 + health_size, 1),
+                          pygame.Rect(health_size, 0, damage_size, HEALTH_BAR_HEIGHT))
+
+        self.window.blit(self.bar, ((self.window.get_width() - width) // 2 - 1,
+                                    self.window.get_height() - HEALTH_BAR_HEIGHT - 6))
+
+
+class Background:
+    def __init__(self, window, rng, composite_layers=BG_COMPOSITE_LAYERS):
         self.planets = pygame.sprite.Group()
-        pygame.time.set_timer(PLANET_EVENT, 45000)
+        self.rng = rng
+        # Changes on every scroll, for the drawing to know when the background stood still:
+        self.version = 0
+        event_timers.set_timer(PLANET_EVENT, 45000)
 
-        self.bg = [pygame.image.load(f'assets/bg/bkgd_{idx}.png').convert_alpha() for idx in [1, 2, 3, 5, 7]]
-        self.bg_width = self.bg[0].get_width()
-        self.scroll = [0] * 8
-        self.tiles = math.ceil(window.get_width() / self.bg_width) + 1
         self.window = window
         self.width = self.window.get_width()
         self.height = self.window.get_height()
+        self.bg = [self.load_layer(f'assets/bg/bkgd_{idx}.png') for idx in [1, 2, 3, 5, 7]]
+        self.bg_width = self.bg[0].get_width()
+        self.scroll = [0] * len(self.bg)
+        self.tiles = math.ceil(window.get_width() / self.bg_width) + 1
 
-    def update_and_draw(self, add_scroll=True):
-        self.window.fill((10, 10, 20))
+        # The slowest layers are pre-blended with the fill color into opaque composites, one per set of relative
+        # offsets between these layers:
+        self.composite_layers = composite_layers
+        self.composites = {}
+
+    def update(self):
+        self.version += 1
+        self.planets.update()
+        base_speed = BG_SPEED
+        for idx in range(len(self.scroll)):
+            self.scroll[idx] += base_speed
+            if self.scroll[idx] > self.bg_width:
+                self.scroll[idx] = 0
+            base_speed *= 1.3
+
+    def load_layer(self, path):
+        # The rows below the screen are never seen, and the sparse layers (mostly transparent stars) blit much faster
+        # RLE encoded:
+        img = pygame.image.load(path).convert_alpha()
+        img = img.subsurface((0, 0, img.get_width(), min(img.get_height(), self.height))).copy()
+        coverage = np.count_nonzero(pygame.surfarray.pixels_alpha(img)) / (img.get_width() * img.get_height())
+        if coverage < BG_RLE_MAX_COVERAGE:
+            img.set_alpha(255, pygame.RLEACCEL)
+        return img
+
+    def offset(self, idx):
+        # Left of the first tile of a layer. Floored, so that all tiles of all layers move by whole pixels together
+        return math.floor(-self.scroll[idx])
+
+    def composite(self, offsets):
+        # Fill color and the slowest layers, with each layer after the first shifted by its offset (wrapping)
+        composite = self.composites.pop(offsets, None)
+        if composite is None:
+            if len(self.composites) >= BG_COMPOSITE_CACHE_SIZE:
+                del self.composites[next(iter(self.composites))]
+            composite = pygame.Surface((self.bg_width, self.height)).convert()
+            composite.fill(BG_COLOR)
+            composite.blit(self.bg[0], (0, 0))
+            for img, offset in zip(self.bg[1:], offsets):
+                composite.blit(img, (offset, 0))
+                composite.blit(img, (offset - self.bg_width, 0))
+        self.composites[offsets] = composite
+        return composite
+
+    def blit_tiles(self, img, offset):
+        # Only the tiles on screen
         for tile in range(self.tiles):
-            for i, img in enumerate(self.bg):
-                self.window.blit(img, (tile * self.bg_width - self.scroll[i], 0))
-        if add_scroll:
-            self.planets.update()
-            base_speed = BG_SPEED
-            for idx in range(len(self.scroll)):
-                self.scroll[idx] += base_speed
-                if self.scroll[idx] > self.bg_width:
-                    self.scroll[idx] = 0
-                base_speed *= 1.3
-
+            x = tile * self.bg_width + offset
+            if x < self.width and x + img.get_width() > 0:
+                self.window.blit(img, (x, 0))
+
+    def draw(self):
+        if self.composite_layers:
+            base = self.offset(0)
+            offsets = tuple((self.offset(idx) - base) % self.bg_width for idx in range(1, self.composite_layers))
+            self.blit_tiles(self.composite(offsets), base)
+        else:
+            self.window.fill(BG_COLOR)
+        for idx in range(self.composite_layers, len(self.bg)):
+            self.blit_tiles(self.bg[idx], self.offset(idx))
         self.planets.draw(self.window)
 
+    def update_and_draw(self):
+        self.update()
+        self.draw()
+
+    @traced('spawn')
     def spawn_planet(self):
-        size = random.randint(200, 500)
-        if random.random() > 0.5:
-            y = random.randint(round(-size / 4), 0)
+        size = self.rng.randint(200, 500)
+        if self.rng.random() > 0.5:
+            y = self.rng.randint(round(-size / 4), 0)
         else:
-            y = random.randint(self.height, self.height + round(size / 4))
+            y = self.rng.randint(self.height, self.height + round(size / 4))
 
-        model = random.randint(1, 16)
-        rotation = random.randint(0, 360)
+        model = self.rng.randint(1, 16)
+        rotation = self.rng.randint(0, 360)
         image = scale_and_rotate(f"assets/Sprites/Planets/planet-{model}.png", rotate=rotation,
                                  size=(size, size))
 
@@ -0,0 +1,3 @@
+"""
+Scripted benchmark scenarios, run headless: python -m src.benchmarks [scenario ...] [--out benchmark.json]
+"""
@@ -0,0 +1,100 @@
+import argparse
+import json
+import platform
+import subprocess
+import time
+
+# Sets up SDL without window and sound, before pygame is initialized:
+from src.headless import add_game_arguments, make_game, window_size
+
+import numpy as np
+import pygame
+
+from src.benchmarks.scenarios import SCENARIOS
+from src.controls import ScriptedInput, WEAVE_SCRIPT
+from src.constants import GameState, BG_COMPOSITE_LAYERS
+from src.profiler import profiler
+
+
+def summary(samples):
+    millis = np.array(samples) * 1000
+    return dict(mean_ms=round(float(millis.mean()), 4), p95_ms=round(float(np.percentile(millis, 95)), 4),
+                p99_ms=round(float(np.percentile(millis, 99)), 4))
+
+
+def hit_rates(lookups_before):
+    # Of the caches watched by the profiler, over the whole scenario
+    rates = {}
+    for name, (hits_before, misses_before) in lookups_before.items():
+        cache = profiler.caches[name][0]
+        hits, misses = cache.hits - hits_before, cache.misses - misses_before
+        rates[name] = round(hits / (hits + misses), 4) if hits + misses else None
+    return rates
+
+
+def run_scenario(scenario, args, draw=True, bg_layers=BG_COMPOSITE_LAYERS):
+    game = make_game(args, ScriptedInput(WEAVE_SCRIPT))
+    game.background.composite_layers = bg_layers
+    game.state_manager.game_state = GameState.RUNNING
+    # No upgrade screen and no game over in the middle of a measure:
+    game.next_upgrade = float('inf')
+    scenario.setup(game)
+
+    profiler.clear()
+    profiler.keep_frames = True
+    lookups = {name: (cache.hits, cache.misses) for name, (cache, samples) in profiler.caches.items()}
+    start = time.perf_counter()
+    for frame in range(scenario.frames):
+        game.spaceship.health = game.spaceship.max_health
+        game.state_manager.running_tick()
+        if draw:
+            profiler.begin('draw')
+            game.draw_action()
+            profiler.end('draw')
+        profiler.end_frame(**game.entity_counts())
+    elapsed = time.perf_counter() - start
+
+    # The stages timed by the profiler, one sample per frame:
+    times = {stage: [frame.get(stage, 0.0) for frame in profiler.frames] for stage in profiler.stages}
+    frame_times = np.sum(list(times.values()), axis=0)
+    return dict(description=scenario.description, frames=scenario.frames, seconds=round(elapsed, 3),
+                entities=profiler.counts, hit_rates=hit_rates(lookups), frame=summary(frame_times),
+                stages={stage: summary(samples) for stage, samples in times.items()})
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m src.benchmarks", description="Runs the benchmark scenarios")
+    parser.add_argument("scenarios", nargs="*", metavar="SCENARIO",
+                        help=f"scenarios to run (default all): {', '.join(SCENARIOS)}")
+    # Not stdout, the game prints its own messages:
+    parser.add_argument("--out", metavar="FILE", default="benchmark.json", help="JSON file for the results")
+    parser.add_argument("--no-draw", action="store_true", help="skip the drawing stage")
+    parser.add_argument("--bg-layers", type=int, default=BG_COMPOSITE_LAYERS,
+                        help="background layers drawn from the pre-composited cache, 0 to draw them all")
+    add_game_arguments(parser)
+    args = parser.parse_args()
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error(f"unknown scenario {name}, choose from {', '.join(SCENARIOS)}")
+
+    results = dict(commit=git_commit(), python=platform.python_version(), pygame=pygame.version.ver,
+                   seed=args.seed, window_size=list(window_size(args)), collision=args.collision,
+                   precision=args.precision, bg_layers=args.bg_layers, scenarios={})
+    for name in args.scenarios or SCENARIOS:
+        result = results['scenarios'][name] = run_scenario(SCENARIOS[name], args, not args.no_draw,
+                                                                args.bg_layers)
+        frame = result['frame']
+        print(f"{name}: {result['frames']} frames in {result['seconds']:.1f} s, frame mean {frame['mean_ms']:.2f} ms, "
+              f"p95 {frame['p95_ms']:.2f} ms, p99 {frame['p99_ms']:.2f} ms")
+
+    with open(args.out, 'w') as file:
+        json.dump(results, file, indent=2)
+    print(f"Results written to {args.out}")
@@ -0,0 +1,57 @@
+from dataclasses import dataclass
+
+from src.enemies import Asteroid
+from src.enemy_spawner import ASTEROID_ANGLES
+from src.upgrades import UpgradeType
+
+
+@dataclass
+class Scenario:
+    name: str
+    description: str
+    frames: int
+    setup: callable
+
+
+def start_level(game, level):
+    # Skips the previous levels and the pause before this one, the level timers do the spawning
+    game.level_controller.current_level = level - 1
+    game.level_controller.level_pause = False
+    game.level_controller.activate_next_level()
+
+
+def setup_swarm(game):
+    # Asteroids and a swarmer every 250 ms:
+    start_level(game, 3)
+
+
+def setup_final_level(game):
+    start_level(game, len(game.level_controller.levels) - 1)
+
+
+def setup_max_upgrades(game):
+    # 4 wingmen, burst 5, 8 projectiles, power shield and rotating shields:
+    upgrades = [UpgradeType.WINGMAN] * 2 + [UpgradeType.BURST] * 4 + [UpgradeType.PROJECTILE] * 7 + \
+               [UpgradeType.SHIELD] * 3 + [UpgradeType.ROTATING_SHIELD]
+    for upgrade in upgrades:
+        game.spaceship.upgrade(upgrade)
+    start_level(game, 10)
+
+
+def setup_asteroid_field(game):
+    game.level_controller.deactivate_all_enemy_events()
+    spawner = game.enemy_spawner
+    for idx in range(1000):
+        asteroid = Asteroid(spawner.images.asteroid_images, ASTEROID_ANGLES,
+                            game.rng.uniform(game.width / 3, game.width), game.rng.uniform(100, game.height - 100),
+                            size=game.rng.randint(1, 3), speed_x=-game.rng.uniform(0.5, 1.5),
+                            speed_y=game.rng.uniform(-0.5, 0.5), rng=game.rng)
+        spawner.add_enemy_ship_sprite(asteroid)
+
+
+SCENARIOS = {scenario.name: scenario for scenario in [
+    Scenario('swarm', "level 3 with a swarmer every 250 ms", 1800, setup_swarm),
+    Scenario('final-level', "final level for 60 s", 3600, setup_final_level),
+    Scenario('max-upgrades', "4 wingmen, burst 5, 8 projectiles and shields on level 10", 1800, setup_max_upgrades),
+    Scenario('asteroids', "1000 asteroids", 600, setup_asteroid_field),
+]}
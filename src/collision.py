@@ -0,0 +1,263 @@
+import itertools
+import math
+from collections import defaultdict
+
+import numpy as np
+import pygame
+
+from src.constants import CollisionShape, CollisionPrecision, COLLISION_PRECISION
+
+COLLISION_CELL_SIZE = 128
+
+
+class SpatialHash:
+    """
+    Uniform grid used as a broad phase for the sprite collisions: every indexed sprite is stored in each cell its
+    rect touches, so a query only has to look at the sprites sharing a cell with the query rect.
+    """
+
+    def __init__(self, cell_size=COLLISION_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = defaultdict(list)
+        self.order = {}
+        self.groups = []
+
+    def clear(self):
+        self.cells.clear()
+        self.order.clear()
+        self.groups = []
+
+    def build(self, *groups):
+        # Rebuilt once per frame, after the sprites moved. Sprites present in more than one group are indexed once.
+        self.clear()
+        self.groups = list(groups)
+        for group in groups:
+            for sprite in group.sprites():
+                self.insert(sprite)
+
+    def indexes(self, group):
+        return any(group is indexed for indexed in self.groups)
+
+    def cell_range(self, rect):
+        size = self.cell_size
+        for cx in range(rect.left // size, (rect.right - 1) // size + 1):
+            for cy in range(rect.top // size, (rect.bottom - 1) // size + 1):
+                yield cx, cy
+
+    def insert(self, sprite):
+        if sprite in self.order:
+            return
+        self.order[sprite] = len(self.order)
+        for cell in self.cell_range(sprite.rect):
+            self.cells[cell].append(sprite)
+
+    def query(self, rect, group=None):
+        """
+        Returns the indexed sprites whose rect overlaps rect (optionally only the ones still in group), in the order
+        they were indexed.
+        """
+        found = set()
+        for cell in self.cell_range(rect):
+            for sprite in self.cells.get(cell, ()):
+                if sprite not in found and rect.colliderect(sprite.rect):
+                    found.add(sprite)
+        if group is not None:
+            found = [sprite for sprite in found if sprite in group]
+        return sorted(found, key=self.order.__getitem__)
+
+    def groupcollide(self, group1, group2):
+        # Same result as groupcollide(group1, group2, False, False), using the spatial hash for the indexed group:
+        hits = {}
+        if self.indexes(group2):
+            for sprite in group1.sprites():
+                collided = self.query(sprite.rect, group2)
+                if collided:
+                    hits[sprite] = collided
+        elif self.indexes(group1):
+            for other in group2.sprites():
+                for sprite in self.query(other.rect, group1):
+                    hits.setdefault(sprite, []).append(other)
+            # keep the group1 ordering of groupcollide:
+            hits = {sprite: hits[sprite] for sprite in sorted(hits, key=self.order.__getitem__)}
+        else:
+            hits = pygame.sprite.groupcollide(group1, group2, False, False)
+        return hits
+
+
+class AABBKernel:
+    """
+    Vectorized rect pass: the rects of both groups go into NumPy arrays and all the overlapping pairs come out of a
+    few broadcast comparisons instead of a Python loop over the sprites.
+    """
+
+    def groupcollide(self, group1, group2):
+        # Same result as groupcollide(group1, group2, False, False)
+        sprites1 = group1.sprites()
+        sprites2 = group2.sprites()
+        if not sprites1 or not sprites2:
+            return {}
+        idx1, idx2 = aabb_pairs(rects_array(sprites1), rects_array(sprites2))
+        hits = {}
+        for i, j in zip(idx1.tolist(), idx2.tolist()):  # row-major, so already in the groupcollide order
+            hits.setdefault(sprites1[i], []).append(sprites2[j])
+        return hits
+
+
+def rects_array(sprites):
+    # (n, 4) array of x, y, width, height
+    rects = (sprite.rect for sprite in sprites)
+    return np.fromiter(itertools.chain.from_iterable(rects), dtype=np.int64, count=4 * len(sprites)).reshape(-1, 4)
+
+
+def aabb_pairs(rects1, rects2):
+    """
+    Returns the indices (idx1, idx2) of all the overlapping rect pairs, with the same rules as Rect.colliderect (rects
+    only touching or with no area don't collide).
+    """
+    left1, top1 = rects1[:, 0, None], rects1[:, 1, None]
+    right1, bottom1 = left1 + rects1[:, 2, None], top1 + rects1[:, 3, None]
+    left2, top2 = rects2[:, 0], rects2[:, 1]
+    right2, bottom2 = left2 + rects2[:, 2], top2 + rects2[:, 3]
+    overlap = (left1 < right2) & (left2 < right1) & (top1 < bottom2) & (top2 < bottom1)
+    overlap &= ((rects1[:, 2] > 0) & (rects1[:, 3] > 0))[:, None]
+    overlap &= (rects2[:, 2] > 0) & (rects2[:, 3] > 0)
+    return np.nonzero(overlap)
+
+
+collision_precision = COLLISION_PRECISION
+
+
+def set_collision_precision(precision):
+    global collision_precision
+    collision_precision = precision
+
+
+def collide_shapes(sprite, other, offset):
+    """
+    Narrow phase for a pair whose rects overlap, using the cheapest test for the collision shapes of both sprites.
+    offset is the position of other's rect relative to sprite's rect (as used by the masks).
+    """
+    if collision_precision == CollisionPrecision.RECT:
+        return True
+    shape, other_shape = sprite.collision_shape, other.collision_shape
+    if collision_precision == CollisionPrecision.PIXEL or CollisionShape.MASK in (shape, other_shape):
+        return sprite.mask.overlap(other.mask, offset) is not None
+    if shape == CollisionShape.RECT and other_shape == CollisionShape.RECT:
+        return True
+    if shape == CollisionShape.CIRCLE and other_shape == CollisionShape.CIRCLE:
+        dx = other.rect.centerx - sprite.rect.centerx
+        dy = other.rect.centery - sprite.rect.centery
+        radii = sprite.radius + other.radius
+        return dx * dx + dy * dy <= radii * radii
+    if shape == CollisionShape.CIRCLE:
+        return circle_rect_collide(sprite.rect.center, sprite.radius, other.rect)
+    return circle_rect_collide(other.rect.center, other.radius, sprite.rect)
+
+
+def circle_rect_collide(center, radius, rect):
+    # closest point of the rect to the circle center:
+    dx = center[0] - min(max(center[0], rect.left), rect.right)
+    dy = center[1] - min(max(center[1], rect.top), rect.bottom)
+    return dx * dx + dy * dy <= radius * radius
+
+
+def swept_entry(sprite, target):
+    """
+    Continuous collision for a fast sprite: returns the fraction (0 to 1) of its last move at which it started
+    touching target, or None if its path missed target. The sprite is swept with its center, so the target is grown
+    by the sprite's size (circle radius or rect half size). When the narrow phase would use the masks, the entry is
+    then confirmed with the masks along the rest of the path.
+    """
+    x0, y0, x1, y1 = sprite.prev_x, sprite.prev_y, sprite.x, sprite.y
+    if collision_precision == CollisionPrecision.RECT:
+        return segment_rect_entry(x0, y0, x1, y1, target.rect.inflate(sprite.rect.width, sprite.rect.height))
+    if collision_precision == CollisionPrecision.PIXEL or CollisionShape.MASK in (sprite.collision_shape,
+                                                                                   target.collision_shape):
+        t = segment_rect_entry(x0, y0, x1, y1, target.rect.inflate(sprite.rect.width, sprite.rect.height))
+        return None if t is None else swept_mask_entry(sprite, target, t)
+    if target.collision_shape == CollisionShape.CIRCLE:
+        return segment_circle_entry(x0, y0, x1, y1, target.rect.center, target.radius + sprite.radius)
+    return segment_rect_entry(x0, y0, x1, y1, target.rect.inflate(sprite.rect.width, sprite.rect.height))
+
+
+def swept_mask_entry(sprite, target, t):
+    # Steps along the path from t, about a pixel at a time, until the masks overlap (crossing only the transparent
+    # corners of the rects is not a hit):
+    x0, y0 = sprite.prev_x, sprite.prev_y
+    dx, dy = sprite.x - x0, sprite.y - y0
+    steps = max(1, math.ceil(math.hypot(dx, dy) * (1 - t)))
+    rect = sprite.rect.copy()
+    target_x, target_y = target.rect.topleft
+    for step in range(steps + 1):
+        t_step = t + (1 - t) * step / steps
+        rect.center = round(x0 + t_step * dx), round(y0 + t_step * dy)
+        if sprite.mask.overlap(target.mask, (target_x - rect.x, target_y - rect.y)) is not None:
+            return t_step
+    return None
+
+
+def segment_rect_entry(x0, y0, x1, y1, rect):
+    # Slab method
+    t_enter, t_exit = 0.0, 1.0
+    for start, delta, low, high in ((x0, x1 - x0, rect.left, rect.right), (y0, y1 - y0, rect.top, rect.bottom)):
+        if delta == 0:
+            if start < low or start > high:
+                return None
+            continue
+        t_low = (low - start) / delta
+        t_high = (high - start) / delta
+        if t_low > t_high:
+            t_low, t_high = t_high, t_low
+        t_enter = max(t_enter, t_low)
+        t_exit = min(t_exit, t_high)
+        if t_enter > t_exit:
+            return None
+    return t_enter
+
+
+def segment_circle_entry(x0, y0, x1, y1, center, radius):
+    dx, dy = x1 - x0, y1 - y0
+    fx, fy = x0 - center[0], y0 - center[1]
+    c = fx * fx + fy * fy - radius * radius
+    if c <= 0:  # starts inside
+        return 0.0
+    a = dx * dx + dy * dy
+    b = 2 * (fx * dx + fy * dy)
+    discriminant = b * b - 4 * a * c
+    if a == 0 or discriminant < 0:
+        return None
+    t = (-b - math.sqrt(discriminant)) / (2 * a)
+    return t if 0 <= t <= 1 else None
+
+
+class CollisionStats:
+    """
+    Counts how many sprite pairs each stage of the two-pass collision rejects: the rect pass (broad phase plus rect
+    test) versus testing all the pairs, and the narrow pass (shape/mask tests) versus its rect pass candidates.
+    """
+
+    def __init__(self):
+        self.pairs = 0
+        self.rect_rejected = 0
+        self.narrow_tests = 0
+        self.narrow_rejected = 0
+        self.swept_hits = 0
+
+    def reset(self):
+        self.__init__()
+
+    def add_rect_pass(self, pairs, candidates):
+        self.pairs += pairs
+        self.rect_rejected += pairs - candidates
+
+    def add_narrow_pass(self, candidates, collided):
+        self.narrow_tests += candidates
+        self.narrow_rejected += candidates - collided
+
+    def __str__(self):
+        return (f"Collision pairs: {self.pairs}, rejected by rect pass: {self.rect_rejected}, "
+                f"narrow tests: {self.narrow_tests}, rejected by narrow pass: {self.narrow_rejected}, "
+                f"swept hits: {self.swept_hits}")
+
+
+collision_stats = CollisionStats()
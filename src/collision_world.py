@@ -0,0 +1,87 @@
+from src.constants import CollisionBackend, SWEEP_SPEED_THRESHOLD
+from src.collision import SpatialHash, AABBKernel, swept_entry, collision_stats
+from src.utils import group_two_pass_collision, sprite_two_pass_collision
+from src.tracing import traced
+
+
+class CollisionWorld:
+    """
+    Indexes every collidable enemy once per frame (after the sprite updates) and answers the collision queries of
+    the frame from that index (gem pickups come from the GemSystem). The queries are asked one after the other, each
+    right before its hit handler: enemies spawned by the handlers of the previous ones (smaller asteroids, ...) are
+    added to the index first, so they are collided in the same frame.
+    """
+
+    def __init__(self, game, backend=CollisionBackend.GRID):
+        self.game = game
+        self.grid = SpatialHash()
+        if backend == CollisionBackend.NUMPY:
+            self.broad_phase = AABBKernel()
+        else:
+            self.broad_phase = self.grid
+
+    @traced('collision')
+    def build(self):
+        spawner = self.game.enemy_spawner
+        self.grid.build(spawner.all_enemies, spawner.enemy_ships)
+
+    @traced('collision')
+    def index_spawned(self):
+        # Sprites already indexed are skipped by insert:
+        for group in self.grid.groups:
+            for sprite in group.sprites():
+                self.grid.insert(sprite)
+
+    def projectile_hits(self):
+        """
+        Returns enemy -> projectiles. Projectiles are killed when they hit (each one hits a single enemy).
+        """
+        spawner = self.game.enemy_spawner
+        projectiles = self.game.spaceship.weapons.projectiles
+        hits = group_two_pass_collision(spawner.enemy_ships, projectiles, False, True,
+                                        broad_phase=self.broad_phase) or {}
+        self.swept_projectile_hits(hits, projectiles, spawner.enemy_ships)
+        return hits
+
+    def spaceship_hits(self):
+        return sprite_two_pass_collision(self.game.spaceship, self.game.enemy_spawner.all_enemies, False,
+                                         grid=self.grid) or []
+
+    def gem_hits(self):
+        return self.game.enemy_spawner.gem_system.pickups(self.game.spaceship)
+
+    def rotating_shield_hits(self):
+        # rotating shield -> enemies
+        return group_two_pass_collision(self.game.spaceship.weapons.rotating_shields,
+                                        self.game.enemy_spawner.enemy_ships, False, False,
+                                        broad_phase=self.broad_phase) or {}
+
+    def shield_hits(self):
+        return sprite_two_pass_collision(self.game.spaceship.weapons.shield, self.game.enemy_spawner.all_enemies,
+                                         False, grid=self.grid) or []
+
+    @traced('collision')
+    def swept_projectile_hits(self, hits, projectiles, enemies):
+        """
+        Fast projectiles can jump over a small enemy between two frames: the ones that didn't hit anything at their
+        current position are collided along their path since the last frame, and hit the first enemy on it. Enemies
+        overlapping the projectile's current rect were already decided by the narrow pass.
+        """
+        threshold = SWEEP_SPEED_THRESHOLD ** 2
+        for projectile in projectiles.sprites():  # the ones that already hit were killed
+            dx = projectile.x - projectile.prev_x
+            dy = projectile.y - projectile.prev_y
+            if dx * dx + dy * dy <= threshold:
+                continue
+            path = projectile.rect.union(projectile.rect.move(-round(dx), -round(dy)))
+            first_hit = None
+            for enemy in self.grid.query(path, enemies):
+                if projectile.rect.colliderect(enemy.rect):
+                    continue
+                t = swept_entry(projectile, enemy)
+                if t is not None and (first_hit is None or t < first_hit[0]):
+                    first_hit = t, enemy
+            if first_hit:
+                hits.setdefault(first_hit[1], []).append(projectile)
+                projectile.kill()
+                collision_stats.swept_hits += 1
@@ -10,13 +10,88 @@ STATUS_BAR_HEIGHT = 0
 
 # FPS
 FPS = 60
+# Simulation ticks per second (all the per-frame counters assume ticks at FPS) and max ticks run per drawn frame:
+SIM_RATE = FPS
+MAX_SUBSTEPS = 5
+# Sprites moving more than this in one tick are drawn at their new position instead of interpolated:
+MAX_INTERPOLATION_DISTANCE = 64
+
+# Frames in the rolling averages of the profiler overlay, and the key showing it:
+PROFILER_WINDOW = 120
+PROFILER_KEY = pygame.K_F3
+# Frames recorded by a trace capture, and the key starting one:
+TRACE_FRAMES = 120
+TRACE_KEY = pygame.K_F4
+
+
+
+class RenderScaling(Enum):
+    NEAREST = 'nearest'  # largest whole factor fitting the window, sharp pixels
+    SMOOTH = 'smooth'  # filtered, filling the window
+
+
+# Internal resolution of the drawing (None for the window size) and its scaling to the window:
+RENDER_SIZE = None
+RENDER_SCALING = RenderScaling.NEAREST
+
+# Dirty rect drawing: max part of the screen redrawn before drawing it whole, and the areas drawn over the background
+DIRTY_RECT_MAX_AREA = 0.6
+SPACESHIP_DRAW_MARGIN = 100
+STATUS_TEXT_HEIGHT = 50
+
+# Rendered text surfaces kept for reuse:
+TEXT_CACHE_SIZE = 64
+
+
+class TrailQuality(Enum):
+    FULL = 'full'  # a shadow for every position of the trail
+    HALF = 'half'  # every other position
+
+
+# Spaceship shadow trail: positions, quality and merged trail shapes kept
+TRAIL_LENGTH = 5
+TRAIL_QUALITY = TrailQuality.FULL
+TRAIL_CACHE_SIZE = 8
 
 class GameState(Enum):
     TEST, START_SCREEN, GAME_OVER, RUNNING, PAUSED, UPGRADE, QUIT = range(7)
 
 
+class CollisionBackend(Enum):
+    GRID = 'grid'
+    NUMPY = 'numpy'
+
+
+# Broad phase used for projectile and rotating shield hits
+COLLISION_BACKEND = CollisionBackend.GRID
+
+class CollisionShape(Enum):
+    CIRCLE, RECT, MASK = range(3)
+
+
+class CollisionPrecision(Enum):
+    PIXEL = 'pixel'  # mask test for every pair
+    SHAPE = 'shape'  # cheapest test for the shapes declared by each entity class (circles may hit a bit early)
+    RECT = 'rect'  # rect test only
+
+
+COLLISION_PRECISION = CollisionPrecision.PIXEL
+
+# Projectiles moving more than this (pixels per frame) are collided along their whole path
+SWEEP_SPEED_THRESHOLD = 8
+
+# Max number of killed sprites kept for reuse by each sprite pool
+SPRITE_POOL_SIZE = 256
+
 SHIELD_INITIAL_DAMAGE = 20
 BG_SPEED = 0.5
+BG_COLOR = (10, 10, 20)
+# Slowest background layers pre-blended into opaque composites, and the number of composites kept. With more than one
+# layer, the composite has to be rebuilt each time their offsets drift apart by a pixel (every few frames):
+BG_COMPOSITE_LAYERS = 1
+BG_COMPOSITE_CACHE_SIZE = 3
+# Background layers with less than this part of visible pixels are RLE encoded:
+BG_RLE_MAX_COVERAGE = 0.1
 
 # Events
 
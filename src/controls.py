@@ -0,0 +1,85 @@
+import pygame
+
+
+class HeldKeys(frozenset):
+    # Indexed by key like the pygame.key.get_pressed() result
+    __getitem__ = frozenset.__contains__
+
+
+# Keys read as held down by the game (spaceship thrusters):
+CONTROL_KEYS = (pygame.K_w, pygame.K_a, pygame.K_s, pygame.K_d)
+
+
+class InputSource:
+    """
+    Where the player's actions come from: tick() is called once per simulation tick, then pressed() gives the held
+    keys, events() filters the pygame events of the tick and choose_upgrade() picks one of the offered upgrades.
+    """
+
+    def tick(self):
+        pass
+
+    def pressed(self):
+        return HeldKeys()
+
+    def events(self, events):
+        return events
+
+    def choose_upgrade(self, events, choices):
+        # choices maps keys to upgrades
+        for event in events:
+            if event.type == pygame.KEYDOWN and event.key in choices:
+                return choices[event.key]
+        return None
+
+
+class KeyboardInput(InputSource):
+    """
+    Live keyboard state, read once per simulation tick.
+    """
+
+    def __init__(self):
+        self.keys = HeldKeys()
+
+    def tick(self):
+        self.keys = pygame.key.get_pressed()
+
+    def pressed(self):
+        return self.keys
+
+
+class ScriptedInput(InputSource):
+    """
+    Plays a list of (ticks, keys) segments: each set of keys is held down for that many ticks, then the next one.
+    The script starts over at the end if loop is set, otherwise no key is held after it.
+    """
+
+    def __init__(self, segments, loop=True):
+        self.segments = [(ticks, HeldKeys(keys)) for ticks, keys in segments]
+        self.loop = loop
+        self.timeline = self.play()
+        self.keys = HeldKeys()
+
+    def play(self):
+        while True:
+            for ticks, keys in self.segments:
+                for _ in range(ticks):
+                    yield keys
+            if not self.loop:
+                return
+
+    def tick(self):
+        self.keys = next(self.timeline, HeldKeys())
+
+    def pressed(self):
+        return self.keys
+
+
+# Weaves up and down across the screen, drifting back and forth:
+WEAVE_SCRIPT = [
+    (40, {pygame.K_w}),
+    (20, {pygame.K_w, pygame.K_d}),
+    (40, {pygame.K_s}),
+    (20, {pygame.K_s, pygame.K_a}),
+    (30, set()),
+]
@@ -1,17 +1,22 @@
 import math
 import random
 
-import numpy as np
 import pygame
 
-from src.constants import FPS
+from src.constants import FPS, CollisionShape
 from src.flying_obj import FlyingObject, AnimatedFO
-from src.utils import SpriteSheet, scale_and_rotate, unit_vector
+from src.kinematics import KinematicBody
+from src.pool import Pooled, SpritePool
+from src.utils import SpriteSheet, scale_and_rotate
 
 
-class Swarmer(FlyingObject):
+class Swarmer(KinematicBody, FlyingObject):
+    collision_shape = CollisionShape.CIRCLE
+    ANGLE_STEP = 5
+
     def __init__(self, swarm_frames, x, y, target, speed=4, health=1, size=1):
-        self.frames = {angle: frame for angle, frame in zip(np.arange(0, 360, 5), swarm_frames)}
+        # One frame per ANGLE_STEP degrees, indexed by angle // ANGLE_STEP:
+        self.frames = swarm_frames
         image = self.frames[0]
         super().__init__(image, x, y, health=health, size=size, collision_damage=10)
         self.target = target
@@ -21,24 +26,18 @@ class Swarmer(FlyingObject):
         self.min_angle = 181
 
     def update(self):
-        delta_x = self.target.x - self.x
-        delta_y = self.target.y - self.y
-        factor = self.speed / math.sqrt(delta_x ** 2 + delta_y ** 2)
-        self.speed_x = factor * delta_x
-        self.speed_y = factor * delta_y
+        # Steering and image are done for all the swarmers at once by the SwarmSystem:
         self.update_positon()
-        # Image angle:
-        angle = (math.degrees(math.atan2(self.speed_y, self.speed_x)) // 5 * 5 + 90) % 360
-        self.image = self.frames[angle]
 
 
-class Asteroid(FlyingObject):
+class Asteroid(KinematicBody, FlyingObject):
+    collision_shape = CollisionShape.CIRCLE
 
-    def __init__(self, asteroid_images, angles, x, y, size=3, speed_x=0.0, speed_y=0.0):
-        angle = random.choice(angles)
-        image_idx = random.randint(1, 4)
-        speed_x = speed_x or -3 * random.random() - 2
-        speed_y = speed_y or 1 - 2 * random.random()
+    def __init__(self, asteroid_images, angles, x, y, size=3, speed_x=0.0, speed_y=0.0, rng=random):
+        angle = rng.choice(angles)
+        image_idx = rng.randint(1, 4)
+        speed_x = speed_x or -3 * rng.random() - 2
+        speed_y = speed_y or 1 - 2 * rng.random()
         super().__init__(asteroid_images[image_idx, size, angle], x, y, speed_x, speed_y, size=size, health=size,
                          collision_damage=size * 10)
         self.score = 10 * (4 - size)
@@ -71,45 +70,49 @@ class ChaserShip(FlyingObject):
                                                      target_y=self.game.spaceship.y, time=self.chase_time)
 
 
-class SlashBullet(AnimatedFO):
-    def __init__(self, slash_img, target, x, y, speed_x=-1.5, speed_y=0.0, accel_x=-0.1, damage=25, max_speed=6):
+class SlashBullet(KinematicBody, AnimatedFO):
+    def __init__(self, slash_img, target, x, y, speed_x=-1.5, speed_y=0.0, accel_x=-0.1, damage=25, max_speed=6,
+                 homing_accel=0.5):
         super().__init__(slash_img, 4, x, y, speed_x, speed_y, accel_x=accel_x, collision_damage=damage)
         self.score = 0
         self.target = target
         self.max_speed = max_speed
+        self.homing_accel = homing_accel
 
-    def update(self):
-        if self.x > self.target.x:
-            self.accel_x, self.accel_y = unit_vector(self.x, self.y, self.target.x, self.target.y, scale=0.5)
-            self.accel_x = min(self.accel_x, 0)
-            if abs(self.speed_x) > self.max_speed:
-                self.speed_x = self.max_speed * np.sign(self.speed_x)
-            if abs(self.speed_y) > self.max_speed:
-                self.speed_y = self.max_speed * np.sign(self.speed_y)
-        else:
-            self.accel_y = self.accel_x = 0
-        super().update()
+    # Homing towards the target is done for all the homing bullets at once by the HomingSystem
 
 
-class FireBullet(AnimatedFO):
+class FireBullet(KinematicBody, AnimatedFO):
+    collision_shape = CollisionShape.CIRCLE
+
     def __init__(self, fire_img, x, y, speed_x=-2.5, speed_y=0.0, accel_x=-0, damage=25):
         super().__init__(fire_img, 5, x, y, speed_x, speed_y, accel_x=accel_x, collision_damage=damage,
                          size=3, mask_image_idx=3)
         self.score = 0
 
 
-class RoundBullet(AnimatedFO):
+class RoundBullet(Pooled, KinematicBody, AnimatedFO):
+    collision_shape = CollisionShape.CIRCLE
+
     def __init__(self, round_bullet_frames, x, y, speed_x=-3, speed_y=0.0, accel_x=-0, damage=10):
         super().__init__(round_bullet_frames, 8, x, y, speed_x, speed_y, accel_x=accel_x, collision_damage=damage)
         self.score = 0
 
 
-class SimpleBullet(FlyingObject):
+round_bullet_pool = SpritePool(RoundBullet)
+
+
+class SimpleBullet(Pooled, KinematicBody, FlyingObject):
+    collision_shape = CollisionShape.RECT
+
     def __init__(self, simple_bullet_img, x, y, speed_x=-8.0, speed_y=0.0, damage=15):
         super().__init__(simple_bullet_img, x, y, speed_x, speed_y, collision_damage=damage, size=1)
         self.score = 0
 
 
+simple_bullet_pool = SpritePool(SimpleBullet)
+
+
 class SineShip(FlyingObject):
     def __init__(self, enemy_spawner, sineship_image, x=0, y=0, speed_x=-3, speed_y=0, acceleration=0.2,
                  acceleration_switch=30, shoot_time=2, first_shot_delay=0, kill_offset=200, level=1):
@@ -150,7 +153,9 @@ class SineShip(FlyingObject):
             raise (NotImplemented("No shoot for level 3+ sineship."))
 
 
-class Gem(AnimatedFO):
+class Gem(KinematicBody, AnimatedFO):
+    collision_shape = CollisionShape.CIRCLE
+
     def __init__(self, gem_images, frame_wait, spaceship, x, y, level=1):
         super().__init__(gem_images, frame_wait, x, y)
 
@@ -162,11 +167,5 @@ class Gem(AnimatedFO):
         self.score = 20 * 5 ** (level-1)
 
     def update(self):
-        if self.is_following:
-            self.speed_x, self.speed_y = unit_vector(self.x, self.y, self.spaceship.x, self.spaceship.y,
-                                                     scale=self.follow_speed)
-        else:
-            if abs(self.x - self.spaceship.x) + abs(
-                    self.y - self.spaceship.y) <= self.spaceship.gem_auto_pickup_distance:
-                self.is_following = True
+        # Attraction to the spaceship is done for all the gems at once by the GemSystem:
         super().update()
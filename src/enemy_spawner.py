@@ -1,12 +1,14 @@
 import math
-import random
 
 import numpy as np
 import pygame
 
 from src.constants import EnemySpawnEvent
-from src.enemies import Swarmer, Asteroid, SlashBullet, FireBullet, SineShip, SimpleBullet, RoundBullet, Gem
-from src.utils import unit_vector, SpriteSheet, scale_and_rotate
+from src.enemies import Swarmer, Asteroid, SlashBullet, FireBullet, SineShip, Gem, simple_bullet_pool, \
+    round_bullet_pool
+from src.systems import SwarmSystem, GemSystem, HomingSystem
+from src.tracing import traced
+from src.utils import SpriteSheet, scale_and_rotate
 
 CHASER_SHIP_IMG = "assets/Sprites/Ships/spaceShips_007.png"
 FIRE_BULLET_IMG = "assets/Sprites/Fire/3/Fire-Wrath__1{}.png"
@@ -27,6 +29,12 @@ class EnemySpawner:
         self.enemy_projectiles = pygame.sprite.Group()
         self.all_enemies = pygame.sprite.Group()
         self.gems = pygame.sprite.Group()
+        self.swarmers = pygame.sprite.Group()
+        self.homing = pygame.sprite.Group()
+
+        self.swarm_system = SwarmSystem(self.swarmers)
+        self.gem_system = GemSystem(self.gems)
+        self.homing_system = HomingSystem(self.homing)
 
     def add_enemy_ship_sprite(self, ship):
         self.enemy_ships.add(ship)
@@ -39,58 +47,70 @@ class EnemySpawner:
     def add_gem(self, gem):
         self.gems.add(gem)
 
+    @traced('spawn')
     def spawn_swarmer(self, x, y):
         swarmer = Swarmer(self.images.swarm_frames, x, y, self.game.spaceship)
         self.add_enemy_ship_sprite(swarmer)
+        self.swarmers.add(swarmer)
 
+    @traced('spawn')
     def spawn_asteroid(self):
         for idx in range(10):  # try a few times to get an asteroid without collision with existing ones
             asteroid = Asteroid(self.images.asteroid_images, ASTEROID_ANGLES, self.game.width,
-                                random.randint(100, self.game.height - 100))
+                                self.game.rng.randint(100, self.game.height - 100), rng=self.game.rng)
             if pygame.sprite.spritecollide(asteroid, self.enemy_ships, False):
                 asteroid.kill()
             else:
                 self.add_enemy_ship_sprite(asteroid)
                 break
 
+    @traced('spawn')
     def spawn_smaller_asteroids(self, asteroid):
-        direction = 1 if random.random() > 0.5 else -1
+        direction = 1 if self.game.rng.random() > 0.5 else -1
         new_size = asteroid.size - 1
         speed_mult = math.sqrt(4.0 - new_size)
         offset = ASTEROID_SIZE * new_size / 3
         ast1 = Asteroid(self.images.asteroid_images, ASTEROID_ANGLES, asteroid.x - direction * offset, asteroid.y - offset, size=asteroid.size - 1,
-                        speed_x=-speed_mult * direction * (random.random()),
-                        speed_y=-speed_mult * (random.random()))
+                        speed_x=-speed_mult * direction * (self.game.rng.random()),
+                        speed_y=-speed_mult * (self.game.rng.random()), rng=self.game.rng)
         ast2 = Asteroid(self.images.asteroid_images, ASTEROID_ANGLES, asteroid.x + direction * offset, asteroid.y + offset, size=asteroid.size - 1,
-                        speed_x=speed_mult * direction * (random.random()),
-                        speed_y=speed_mult * (random.random()))
+                        speed_x=speed_mult * direction * (self.game.rng.random()),
+                        speed_y=speed_mult * (self.game.rng.random()), rng=self.game.rng)
         self.add_enemy_ship_sprite(ast1)
         self.add_enemy_ship_sprite(ast2)
 
+    @traced('spawn')
     def spawn_random_slash_bullet(self):
-        bullet = SlashBullet(self.images.slash_img, self.game.spaceship, self.game.width + 10, random.randint(40, self.game.height - 40))
+        bullet = SlashBullet(self.images.slash_img, self.game.spaceship, self.game.width + 10, self.game.rng.randint(40, self.game.height - 40))
         self.add_enemy_projectile_sprite(bullet)
+        self.homing.add(bullet)
 
+    @traced('spawn')
     def spawn_random_fire_bullet(self):
-        bullet = FireBullet(self.images.fire_img, self.game.width + 10, random.randint(40, self.game.height - 40))
+        bullet = FireBullet(self.images.fire_img, self.game.width + 10, self.game.rng.randint(40, self.game.height - 40))
         self.add_enemy_projectile_sprite(bullet)
 
+    @traced('spawn')
     def spawn_random_sineship(self, shoot_time=1, group=1):
-        y = random.randint(100, self.game.height - 100)
+        y = self.game.rng.randint(100, self.game.height - 100)
         for idx in range(group):
             ship = SineShip(self, self.images.sineship_image, x=self.game.width + 75 * idx, y=y, shoot_time=shoot_time,
                             first_shot_delay=idx * 0.2, kill_offset=100*group)
             self.add_enemy_ship_sprite(ship)
 
+    @traced('spawn')
     def spawn_simple_bullet(self, x, y, **kwargs):
-        bullet = SimpleBullet(self.images.simple_bullet_img, x, y, **kwargs)
+        bullet = simple_bullet_pool.acquire(self.images.simple_bullet_img, x, y, **kwargs)
         self.add_enemy_projectile_sprite(bullet)
 
+    @traced('spawn')
     def spawn_targeted_round_bullet(self, x, y, speed=4, **kwargs):
-        target_vector = unit_vector(x, y, self.game.spaceship.x, self.game.spaceship.y)
-        bullet = RoundBullet(self.images.round_bullet_frames, x, y, speed_x=speed * target_vector[0], speed_y=speed * target_vector[1])
+        bullet = round_bullet_pool.acquire(self.images.round_bullet_frames, x, y, speed_x=0, speed_y=0)
         self.add_enemy_projectile_sprite(bullet)
+        # Aimed at the spaceship with the other bullets spawned this frame:
+        self.homing_system.aim(bullet, self.game.spaceship, speed)
 
+    @traced('spawn')
     def spawn_gem(self, x, y, level=1):
         gem = Gem(self.images.gem_images[level], frame_wait=20, spaceship=self.game.spaceship, x=x, y=y, level=level)
         self.add_gem(gem)
@@ -101,7 +121,7 @@ class EnemySpawner:
             self.spawn_asteroid()
 
         if event.type == EnemySpawnEvent.SWARM.value:
-            self.spawn_swarmer(self.game.width + 20, random.randint(0, self.game.height), **event.dict)
+            self.spawn_swarmer(self.game.width + 20, self.game.rng.randint(0, self.game.height), **event.dict)
 
         if event.type == EnemySpawnEvent.FIREBALL.value:
             self.spawn_random_fire_bullet(**event.dict)
@@ -2,22 +2,31 @@ import random
 
 import pygame
 
+from src.assets import derived_images
+from src.constants import CollisionShape
+from src.kinematics import KinematicBody
+from src.pool import Pooled, SpritePool
+from src.tracing import traced
 from src.utils import scale_and_rotate, SpriteSheet
 
 
 class FlyingObject(pygame.sprite.Sprite):
+    # Narrow phase test used for this class (see collision.collide_shapes):
+    collision_shape = CollisionShape.MASK
+
     def __init__(self, image, x, y, speed_x=0.0, speed_y=0.0, accel_x=0.0, accel_y=0.0,
                  health=1, size=1, collision_damage=10, hit_color=(255, 255, 255, 50), kill_offset=200):
         super().__init__()
         self.original_image = image
         self.image = image
-        self.mask = pygame.mask.from_surface(self.image, threshold=0)
-        # Copy original image and add an transparent mask on top for the hit:
-        self.hit_image = image.copy()
-        self.hit_image.blit(self.mask.to_surface(setcolor=hit_color, unsetcolor=None).convert_alpha(), (0, 0))
+        # Mask, hit image and circle radius are shared with every other sprite using the same image:
+        self.mask, self.hit_image, self.radius = derived_images.get(image, hit_color)
 
         self.x = x
         self.y = y
+        # Position before the last move, for the swept collisions of fast objects:
+        self.prev_x = x
+        self.prev_y = y
         self.rect = self.image.get_rect()
         self.rect.center = round(self.x), round(self.y)
         self.speed_x = speed_x
@@ -35,6 +44,8 @@ class FlyingObject(pygame.sprite.Sprite):
         self.hit_cooldown = self.hit_cooldown_time
 
     def update_positon(self):
+        self.prev_x = self.x
+        self.prev_y = self.y
         self.speed_x += self.accel_x
         self.speed_y += self.accel_y
         self.x += self.speed_x
@@ -84,7 +95,7 @@ class AnimatedFO(FlyingObject):
         self.anim_speed_counter = 0
 
     def update(self):
-        FlyingObject.update_positon(self)
+        self.update_positon()
         self.anim_speed_counter += 1
         if self.anim_speed_counter > self.anim_speed:
             self.anim_speed_counter = 0
@@ -92,7 +103,7 @@ class AnimatedFO(FlyingObject):
             self.image = self.images[self.img_idx]
 
 
-class Planet(FlyingObject):
+class Planet(KinematicBody, FlyingObject):
     def __init__(self, image, x, y, size):
         self.size = size
         super().__init__(image, x, y, speed_x=-1.2)
@@ -102,37 +113,48 @@ class Planet(FlyingObject):
         if self.rect.right < 0:
             self.kill()
 
-class Explosion(pygame.sprite.Sprite):
+class Explosion(Pooled, pygame.sprite.Sprite):
+    # Frames for each set of sprite sheet parameters, and the sound, are loaded once:
+    frames_cache = {}
+    audio = None
+
     def __init__(self, x, y, sprite_sheet, n_frames, width, height, scale=4, frame_update_steps=5):
         super().__init__()
         # self.sprite_sheet_image = pygame.image.load('assets/explosion.png').convert_alpha()
         # self.sprite_sheet_image = pygame.image.load('assets/explosion1.png').convert_alpha()
 
-        self.sprite_sheet_image = pygame.image.load(sprite_sheet).convert_alpha()
-        self.sprite_sheet = SpriteSheet(self.sprite_sheet_image)
         self.active_frame = 0
         self.frame_timer = 0
         self.frame_update_steps = frame_update_steps
-        self.frames = []
-        for idx in range(n_frames):
-            self.frames.append(self.sprite_sheet.get_image(idx, 0, width=width, height=height, scale=scale))
+        self.frames = Explosion.load_frames(sprite_sheet, n_frames, width, height, scale)
 
         self.image = self.frames[0]
         self.rect = self.image.get_rect(center=(x, y))
-        self.audio = pygame.mixer.Sound('assets/explosion.wav')
-        self.audio.set_volume(0.25)
+        if Explosion.audio is None:
+            Explosion.audio = pygame.mixer.Sound('assets/explosion.wav')
+            Explosion.audio.set_volume(0.25)
         self.audio.play()
 
     @staticmethod
-    def create(x, y, size=1):
+    @traced('asset')
+    def load_frames(sprite_sheet, n_frames, width, height, scale):
+        key = sprite_sheet, n_frames, width, height, scale
+        if key not in Explosion.frames_cache:
+            sheet = SpriteSheet(pygame.image.load(sprite_sheet).convert_alpha())
+            Explosion.frames_cache[key] = [sheet.get_image(idx, 0, width=width, height=height, scale=scale)
+                                           for idx in range(n_frames)]
+        return Explosion.frames_cache[key]
+
+    @staticmethod
+    def create(x, y, size=1, rng=random):
         EXPLOSIONS = [
             ['assets/explosion.png', 6, 32, 32, 1, 4],
             ['assets/explosion1.png', 9, 15, 14, 2.13, 3],
             ['assets/explosion2.png', 9, 10, 9, 3.2, 3],
         ]
-        exp_param = random.choice(EXPLOSIONS)
+        exp_param = rng.choice(EXPLOSIONS)
         exp_param[-2] *= size
-        return Explosion(x, y, *exp_param)
+        return explosion_pool.acquire(x, y, *exp_param)
 
     def update(self):
         self.frame_timer += 1
@@ -145,3 +167,5 @@ class Explosion(pygame.sprite.Sprite):
                 self.image = self.frames[self.active_frame]
                 self.rect = self.image.get_rect(center=self.rect.center)
 
+
+explosion_pool = SpritePool(Explosion)
@@ -10,14 +10,21 @@ __author__ = "$Author: DR0ID $"
 __version__ = "$Revision: 109 $"
 __date__ = "$Date: 2007-08-09 20:33:32 +0200 (Do, 09 Aug 2007) $"
 
-import pygame
+import functools
 import math
+from collections import OrderedDict
+
+import numpy as np
+import pygame
 
 BLEND_MODES_AVAILABLE = False
 vernum = pygame.vernum
 if vernum[0] >= 1 and vernum[1] >= 8:
     BLEND_MODES_AVAILABLE = True
 
+# Bytes of gradient surfaces kept by the memoized functions, all together:
+CACHE_BYTES = 16 * 1024 * 1024
+
 
 class ColorInterpolator(object):
     '''
@@ -50,6 +57,17 @@ class ColorInterpolator(object):
                 self.bInterpolator.eval(x),
                 self.aInterpolator.eval(x)]
 
+    def eval_array(self, x):
+        '''
+        eval_array(x) -> array
+
+        same as eval for every position of the array x, the colors along a last axis of 4.
+        '''
+        return np.stack([self.rInterpolator.eval_array(x),
+                         self.gInterpolator.eval_array(x),
+                         self.bInterpolator.eval_array(x),
+                         self.aInterpolator.eval_array(x)], axis=-1)
+
 
 class FunctionInterpolator(object):
     '''
@@ -89,153 +107,232 @@ class FunctionInterpolator(object):
         ##        return int(round(min(max(self.a*self.func(self.b*(x+self.c))+self.d, 0), 255)))
         return int(min(max(self.a * self.func(self.b * (x + self.c)) + self.d, 0), 255))
 
+    def eval_array(self, x):
+        '''
+        eval_array(x)->array
 
-def vertical(size, startcolor, endcolor):
+        same as eval for every position of the array x
+        '''
+        return np.clip(self.a * _apply(self.func, self.b * (x + self.c)) + self.d, 0, 255).astype(np.uint8)
+
+
+def _apply(func, *args):
     """
-    Draws a vertical linear gradient filling the entire surface. Returns a
-    surface filled with the gradient (numeric is only 2-3 times faster).
+    func(*args) on whole arrays, or value by value for functions taking only numbers (e.g. using math or if).
     """
-    height = size[1]
-    bigSurf = pygame.Surface((1, height)).convert_alpha()
-    dd = 1.0 / height
+    try:
+        values = np.asarray(func(*args), dtype=float)
+    except (TypeError, ValueError):
+        values = np.vectorize(func, otypes=[float])(*args)
+    return np.broadcast_to(values, np.broadcast(*args).shape)
+
+
+def _key(arg):
+    # pygame.Color and lists can't be hashed
+    if isinstance(arg, (pygame.Color, list)):
+        return tuple(arg)
+    return arg
+
+
+class SurfaceCache(object):
+    """
+    Surfaces by key, the least recently used dropped first once they take more than max_bytes. A surface bigger
+    than a quarter of max_bytes (e.g. the rotated gradients of draw_gradient) is never kept.
+    """
+
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.surfaces = OrderedDict()
+        self.bytes = 0
+
+    def get(self, key):
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+        return surface
+
+    def put(self, key, surface):
+        size = surface.get_width() * surface.get_height() * surface.get_bytesize()
+        if size > self.max_bytes // 4:
+            return
+        self.surfaces[key] = surface
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            dropped = self.surfaces.popitem(last=False)[1]
+            self.bytes -= dropped.get_width() * dropped.get_height() * dropped.get_bytesize()
+
+    def clear(self):
+        self.surfaces.clear()
+        self.bytes = 0
+
+
+_cache = SurfaceCache()
+
+
+def memoized(function):
+    """
+    Keeps the surfaces returned by function for the same arguments (colors compared by value) in the shared
+    SurfaceCache. The surfaces are shared, so they must not be drawn on.
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        args = tuple(map(_key, args))
+        kwargs = {name: _key(value) for name, value in kwargs.items()}
+        key = function, args, tuple(sorted(kwargs.items()))
+        surface = _cache.get(key)
+        if surface is None:
+            surface = function(*args, **kwargs)
+            _cache.put(key, surface)
+        return surface
+    return wrapper
+
+
+def _surface(rgba):
+    # Surface with per pixel alpha from an array of colors indexed [x, y]
+    surface = pygame.Surface(rgba.shape[:2]).convert_alpha()
+    pygame.surfarray.pixels3d(surface)[...] = rgba[..., :3]
+    pygame.surfarray.pixels_alpha(surface)[...] = rgba[..., 3]
+    return surface
+
+
+def _linear(length, startcolor, endcolor):
+    # Colors of a linear gradient over length pixels, truncated like int()
     sr, sg, sb, sa = startcolor
     er, eg, eb, ea = endcolor
-    rm = (er - sr) * dd
-    gm = (eg - sg) * dd
-    bm = (eb - sb) * dd
-    am = (ea - sa) * dd
-    for y in range(height):
-        bigSurf.set_at((0, y),
-                       (int(sr + rm * y),
-                        int(sg + gm * y),
-                        int(sb + bm * y),
-                        int(sa + am * y))
-                       )
-    return pygame.transform.scale(bigSurf, size)
+    dd = 1.0 / length
+    steps = np.arange(length)
+    return np.stack([sr + (er - sr) * dd * steps,
+                     sg + (eg - sg) * dd * steps,
+                     sb + (eb - sb) * dd * steps,
+                     sa + (ea - sa) * dd * steps], axis=-1).astype(np.uint8)
+
+
+def _stepped(startcolor, endcolor, dd, count):
+    # Colors of the gradients drawn shape by shape, from startcolor at step 0
+    start = np.array(tuple(startcolor), dtype=float)
+    slope = (start - np.array(tuple(endcolor), dtype=float)) * dd
+    return (start + np.trunc(slope * np.arange(count)[:, np.newaxis])).astype(np.uint8)
+
+
+def _circle_radii(size, center):
+    """
+    Radius of the smallest circle drawn by pygame.draw.circle around center covering each pixel (a surface of size,
+    indexed [x, y]). The circles of radius r cover the pixels with a * a + b * b - max(a, b) < r * r, where a and b
+    count the pixels from the center (1 for the pixels next to it, left or right of the center alike), except for
+    radius 1 which covers the 4 pixels with a = b = 1.
+    """
+    x, y = np.indices(size)
+    a = np.where(x >= center[0], x - center[0] + 1, center[0] - x)
+    b = np.where(y >= center[1], y - center[1] + 1, center[1] - y)
+    radii = np.sqrt(a * a + b * b - np.maximum(a, b)).astype(int) + 1
+    radii[(a == 1) & (b == 1)] = 1
+    return radii
+
+
+def _square_sizes(size, center):
+    # Half width of the smallest square drawn around center covering each pixel, centered like _circle_radii
+    x, y = np.indices(size)
+    return np.maximum(np.where(x >= center[0], x - center[0] + 1, center[0] - x),
+                      np.where(y >= center[1], y - center[1] + 1, center[1] - y))
+
+
+def _nested(sizes, max_size, colors, background):
+    # Pixels colored by the size of the smallest shape covering them, background where no shape reaches
+    rgba = np.empty(sizes.shape + (4,), dtype=np.uint8)
+    rgba[...] = background
+    inside = sizes <= max_size
+    rgba[inside] = colors[sizes[inside]]
+    return rgba
 
 
+@memoized
+def vertical(size, startcolor, endcolor):
+    """
+    Draws a vertical linear gradient filling the entire surface. Returns a
+    surface filled with the gradient.
+    """
+    colors = _linear(size[1], startcolor, endcolor)
+    return _surface(np.broadcast_to(colors, (size[0],) + colors.shape))
+
+
+@memoized
 def horizontal(size, startcolor, endcolor):
     """
     Draws a horizontal linear gradient filling the entire surface. Returns a
-    surface filled with the gradient (numeric is only 2-3 times faster).
+    surface filled with the gradient.
     """
-    width = size[0]
-    bigSurf = pygame.Surface((width, 1)).convert_alpha()
-    dd = 1.0 / width
-    sr, sg, sb, sa = startcolor
-    er, eg, eb, ea = endcolor
-    rm = (er - sr) * dd
-    gm = (eg - sg) * dd
-    bm = (eb - sb) * dd
-    am = (ea - sa) * dd
-    for y in range(width):
-        bigSurf.set_at((y, 0),
-                       (int(sr + rm * y),
-                        int(sg + gm * y),
-                        int(sb + bm * y),
-                        int(sa + am * y))
-                       )
-    return pygame.transform.scale(bigSurf, size)
+    colors = _linear(size[0], startcolor, endcolor)
+    return _surface(np.broadcast_to(colors[:, np.newaxis], (size[0], size[1], 4)))
 
 
+@memoized
 def radial(radius, startcolor, endcolor):
     """
     Draws a linear raidal gradient on a square sized surface and returns
     that surface.
     """
-    bigSurf = pygame.Surface((2 * radius, 2 * radius)).convert_alpha()
-    bigSurf.fill((0, 0, 0, 0))
-    dd = -1.0 / radius
-    sr, sg, sb, sa = endcolor
-    er, eg, eb, ea = startcolor
-    rm = (er - sr) * dd
-    gm = (eg - sg) * dd
-    bm = (eb - sb) * dd
-    am = (ea - sa) * dd
-
-    draw_circle = pygame.draw.circle
-    for rad in range(radius, 0, -1):
-        draw_circle(bigSurf, (er + int(rm * rad),
-                              eg + int(gm * rad),
-                              eb + int(bm * rad),
-                              ea + int(am * rad)), (radius, radius), rad)
-    return bigSurf
+    colors = _stepped(startcolor, endcolor, -1.0 / radius, radius + 1)
+    radii = _circle_radii((2 * radius, 2 * radius), (radius, radius))
+    return _surface(_nested(radii, radius, colors, (0, 0, 0, 0)))
 
 
+@memoized
 def squared(width, startcolor, endcolor):
     """
     Draws a linear sqared gradient on a square sized surface and returns
     that surface.
     """
-    bigSurf = pygame.Surface((width, width)).convert_alpha()
-    bigSurf.fill((0, 0, 0, 0))
-    dd = -1.0 / (width / 2)
-    sr, sg, sb, sa = endcolor
-    er, eg, eb, ea = startcolor
-    rm = (er - sr) * dd
-    gm = (eg - sg) * dd
-    bm = (eb - sb) * dd
-    am = (ea - sa) * dd
-
-    draw_rect = pygame.draw.rect
-    for currentw in range((width / 2), 0, -1):
-        pos = (width / 2) - currentw
-        draw_rect(bigSurf, (er + int(rm * currentw),
-                            eg + int(gm * currentw),
-                            eb + int(bm * currentw),
-                            ea + int(am * currentw)), pygame.Rect(pos, pos, 2 * currentw, 2 * currentw))
-    return bigSurf
+    half = width // 2
+    colors = _stepped(startcolor, endcolor, -1.0 / half, half + 1)
+    sizes = _square_sizes((width, width), (half, half))
+    return _surface(_nested(sizes, half, colors, (0, 0, 0, 0)))
 
 
+@memoized
 def vertical_func(size, startcolor, endcolor, Rfunc=(lambda x: x), Gfunc=(lambda x: x), Bfunc=(lambda x: x),
                   Afunc=(lambda x: 1)):
     """
     Draws a vertical linear gradient filling the entire surface. Returns a
-    surface filled with the gradient (numeric is only 2x faster).
+    surface filled with the gradient.
     Rfunc, Gfunc, Bfunc and Afunc are function like y = f(x). They define
     how the color changes.
     """
     height = size[1]
-    bigSurf = pygame.Surface((1, height)).convert_alpha()
     color = ColorInterpolator(height, startcolor, endcolor, Rfunc, Gfunc, Bfunc, Afunc)
-    for y in range(0, height):
-        bigSurf.set_at((0, y), color.eval(y + 0.1))
-    return pygame.transform.scale(bigSurf, size)
+    colors = color.eval_array(np.arange(height) + 0.1)
+    return _surface(np.broadcast_to(colors, (size[0],) + colors.shape))
 
 
+@memoized
 def horizontal_func(size, startcolor, endcolor, Rfunc=(lambda x: x), Gfunc=(lambda x: x), Bfunc=(lambda x: x),
                     Afunc=(lambda x: 1)):
     """
     Draws a horizontal linear gradient filling the entire surface. Returns a
-    surface filled with the gradient (numeric is only 2x faster).
+    surface filled with the gradient.
     Rfunc, Gfunc, Bfunc and Afunc are function like y = f(x). They define
     how the color changes.
     """
     width = size[0]
-    bigSurf = pygame.Surface((width, 1)).convert_alpha()
     color = ColorInterpolator(width, startcolor, endcolor, Rfunc, Gfunc, Bfunc, Afunc)
-    for y in range(0, width):
-        bigSurf.set_at((y, 0), color.eval(y + 0.1))
-    return pygame.transform.scale(bigSurf, size)
+    colors = color.eval_array(np.arange(width) + 0.1)
+    return _surface(np.broadcast_to(colors[:, np.newaxis], (size[0], size[1], 4)))
 
 
+@memoized
 def radial_func(radius, startcolor, endcolor, Rfunc=(lambda x: x), Gfunc=(lambda x: x), Bfunc=(lambda x: x),
                 Afunc=(lambda x: 1), colorkey=(0, 0, 0, 0)):
     """
     Draws a linear raidal gradient on a square sized surface and returns
     that surface.
     """
-    bigSurf = pygame.Surface((2 * radius, 2 * radius)).convert_alpha()
     if len(colorkey) == 3:
         colorkey += (0,)
-    bigSurf.fill(colorkey)
     color = ColorInterpolator(radius, startcolor, endcolor, Rfunc, Gfunc, Bfunc, Afunc)
-    draw_circle = pygame.draw.circle
-    for rad in range(radius, 0, -1):
-        draw_circle(bigSurf, color.eval(rad), (radius, radius), rad)
-    return bigSurf
+    radii = _circle_radii((2 * radius, 2 * radius), (radius, radius))
+    return _surface(_nested(radii, radius, color.eval_array(np.arange(radius + 1)), colorkey))
 
 
+@memoized
 def radial_func_offset(radius, startcolor, endcolor, Rfunc=(lambda x: x), Gfunc=(lambda x: x), Bfunc=(lambda x: x),
                        Afunc=(lambda x: 1), colorkey=(0, 0, 0, 0), offset=(0, 0)):
     """
@@ -253,36 +350,29 @@ def radial_func_offset(radius, startcolor, endcolor, Rfunc=(lambda x: x), Gfunc=
 
     if len(colorkey) == 3:
         colorkey += (0,)
-    bigSurf.fill(colorkey)
 
     color = ColorInterpolator(radius, startcolor, endcolor, Rfunc, Gfunc, Bfunc, Afunc)
-    draw_circle = pygame.draw.circle
     radi = radius + int(math.hypot(offset[0], offset[1]) + 1)
-    for rad in range(radi, 0, -1):
-        draw_circle(bigSurf, color.eval(rad), (radius + offset[0], radius + offset[1]), rad)
+    radii = _circle_radii((2 * radius, 2 * radius), (radius + offset[0], radius + offset[1]))
+    rgba = _nested(radii, radi, color.eval_array(np.arange(radi + 1)), colorkey)
+    pygame.surfarray.blit_array(bigSurf, rgba[..., :3])
 
     bigSurf.blit(mask, (0, 0))
     bigSurf.set_colorkey(colorkey)
     return bigSurf
 
 
+@memoized
 def squared_func(width, startcolor, endcolor, Rfunc=(lambda x: x), Gfunc=(lambda x: x), Bfunc=(lambda x: x),
                  Afunc=(lambda x: 1), offset=(0, 0)):
     """
     Draws a linear sqared gradient on a square sized surface and returns
     that surface.
     """
-    bigSurf = pygame.Surface((width, width)).convert_alpha()
-    bigSurf.fill((0, 0, 0, 0))
     color = ColorInterpolator(width / 2, startcolor, endcolor, Rfunc, Gfunc, Bfunc, Afunc)
-    draw_rect = pygame.draw.rect
-    widthh = width + 2 * int(max(abs(offset[0]), abs(offset[1])))
-    for currentw in range((widthh / 2), 0, -1):
-        ##        pos = (width/2)-currentw
-        rect = pygame.Rect(0, 0, 2 * currentw, 2 * currentw)
-        rect.center = (width / 2 + offset[0], width / 2 + offset[1])
-        draw_rect(bigSurf, color.eval(currentw), rect)
-    return bigSurf
+    half = (width + 2 * int(max(abs(offset[0]), abs(offset[1])))) // 2
+    sizes = _square_sizes((width, width), (width // 2 + offset[0], width // 2 + offset[1]))
+    return _surface(_nested(sizes, half, color.eval_array(np.arange(half + 1)), (0, 0, 0, 0)))
 
 
 def draw_gradient(surface, startpoint, endpoint, startcolor, endcolor, Rfunc=(lambda x: x), Gfunc=(lambda x: x),
@@ -413,12 +503,9 @@ def genericFxyGradient(surf, clip, color1, color2, func, intx, yint, zint=None):
         z2 = max(zint)
     else:  # look for extrema of function (not best algorithme)
         z1 = func(x1, y1)
-        z2 = z1
-        for i in range(w):
-            for j in range(h):
-                r = func(i, j)
-                z1 = min(z1, r)
-                z2 = max(z2, r)
+        values = _apply(func, *np.indices((w, h)))
+        z2 = max(z1, values.max())
+        z1 = min(z1, values.min())
 
     x1 = float(x1)
     x2 = float(x2)
@@ -447,15 +534,9 @@ def genericFxyGradient(surf, clip, color1, color2, func, intx, yint, zint=None):
     c = x1 / b
     e = y1 / d
 
-    surff = pygame.surface.Surface((w, h)).convert_alpha()
-    # generate values
-    for i in range(h):
-        for j in range(w):
-            val = func(b * (j + c), d * (i + e))
-            # clip color
-            color = (max(min(a[0] * val + f[0], 255), 0), \
-                     max(min(a[1] * val + f[1], 255), 0), \
-                     max(min(a[2] * val + f[2], 255), 0), \
-                     max(min(a[3] * val + f[3], 255), 0))
-            surff.set_at((j, i), color)
-    surf.blit(surff, clip)
+    # generate values, x and y indexed [x, y] like surfarray
+    x, y = np.indices((w, h))
+    val = _apply(func, b * (x + c), d * (y + e))
+    # clip color
+    rgba = np.stack([np.clip(a[idx] * val + f[idx], 0, 255) for idx in range(4)], axis=-1).astype(np.uint8)
+    surf.blit(_surface(rgba), clip)
@@ -0,0 +1,115 @@
+import argparse
+import os
+import time
+
+# No window and no sound, this has to be set before pygame is initialized:
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+from src.basegame import Game
+from src.collision import set_collision_precision, collision_stats
+from src.controls import ScriptedInput, WEAVE_SCRIPT
+from src.constants import GameState, SIM_RATE, COLLISION_BACKEND, CollisionBackend, COLLISION_PRECISION, \
+    CollisionPrecision
+from src.replay import ReplayPlayer, ReplayRecorder
+
+
+class HeadlessRunner:
+    """
+    Runs the game simulation tick after tick as fast as possible, without drawing anything. Upgrades not given by the
+    input source are chosen at random instead of waiting on the upgrade screen.
+    """
+
+    def __init__(self, game, invulnerable=False):
+        self.game = game
+        self.invulnerable = invulnerable
+        self.ticks = 0
+        game.state_manager.game_state = GameState.RUNNING
+
+    def state(self):
+        return self.game.state_manager.game_state
+
+    def tick(self):
+        state_manager = self.game.state_manager
+        if state_manager.game_state == GameState.UPGRADE:
+            self.choose_upgrade()
+
+        if state_manager.game_state == GameState.RUNNING:
+            state_manager.running_tick()
+            self.game.game_time += 1 / SIM_RATE
+            if self.invulnerable:
+                self.game.spaceship.health = self.game.spaceship.max_health
+        self.ticks += 1
+
+    def choose_upgrade(self):
+        # Same draw of the offered upgrades as the upgrade screen, so the runs stay comparable with the game
+        choices = self.game.state_manager.upgrade_options()
+        upgrade = self.game.controls.choose_upgrade([], choices) or self.game.rng.choice(list(choices.values()))
+        self.game.state_manager.select_upgrade(upgrade)
+
+    def run(self, max_ticks, until_level=None):
+        # Runs until the level is reached, the game is over or max_ticks have been simulated
+        while self.ticks < max_ticks and self.state() in (GameState.RUNNING, GameState.UPGRADE):
+            if until_level is not None and self.game.level_controller.current_level >= until_level:
+                break
+            self.tick()
+
+
+def add_game_arguments(parser):
+    """
+    Adds the arguments setting up the game, shared by the tools running it without a window (this runner and the
+    benchmarks).
+    """
+    parser.add_argument("--seed", type=int, default=1, help="seed of the game randomness")
+    parser.add_argument("--size", default="1920x1080", help="simulated screen size, WIDTHxHEIGHT")
+    parser.add_argument("--collision", choices=[backend.value for backend in CollisionBackend],
+                        default=COLLISION_BACKEND.value, help="broad phase for projectile/shield hits")
+    parser.add_argument("--precision", choices=[precision.value for precision in CollisionPrecision],
+                        default=COLLISION_PRECISION.value, help="collision accuracy vs speed")
+
+
+def window_size(args):
+    return tuple(map(int, args.size.split('x')))
+
+
+def make_game(args, controls, seed=None, size=None):
+    """
+    Returns a new Game set up from the add_game_arguments arguments, seed and size replace the ones of the arguments
+    when given (e.g. by a replay).
+    """
+    set_collision_precision(CollisionPrecision(args.precision))
+    return Game(collision_backend=CollisionBackend(args.collision), controls=controls,
+                window_size=size or window_size(args), seed=args.seed if seed is None else seed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Runs the game without a window, faster than real time")
+    parser.add_argument("--level", type=int, default=15, help="stop when this level is reached")
+    parser.add_argument("--ticks", type=int, default=60 * 60 * SIM_RATE, help="max simulation ticks")
+    parser.add_argument("--invulnerable", action="store_true", help="keep the spaceship at full health")
+    parser.add_argument("--record", metavar="FILE", help="record the inputs to a replay file")
+    parser.add_argument("--replay", metavar="FILE", help="play the inputs of a replay file")
+    add_game_arguments(parser)
+    args = parser.parse_args()
+
+    seed, size, max_ticks = None, None, args.ticks
+    controls = ScriptedInput(WEAVE_SCRIPT)
+    if args.replay:
+        controls = ReplayPlayer(args.replay)
+        seed, size, max_ticks = controls.seed, controls.window_size, controls.length
+    if args.record:
+        controls = ReplayRecorder(controls)
+
+    game = make_game(args, controls, seed=seed, size=size)
+    runner = HeadlessRunner(game, invulnerable=args.invulnerable)
+
+    start = time.perf_counter()
+    runner.run(max_ticks, until_level=args.level)
+    elapsed = time.perf_counter() - start
+
+    print(f"{runner.ticks} ticks ({game.game_time:.0f} s of game) in {elapsed:.1f} s, "
+          f"{game.game_time / elapsed:.1f}x real time")
+    print(f"Level {game.level_controller.current_level}, score {game.score}, {runner.state().name}")
+    print(collision_stats)
+    if args.record:
+        controls.save(args.record, game)
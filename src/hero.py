@@ -1,20 +1,23 @@
 import pygame
 import math
-from queue import Queue
+from collections import deque
 
 import numpy as np
 
-from src.constants import SHIELD_INITIAL_DAMAGE, FPS, SPACESHIP_DESTROYED
+from src.constants import SHIELD_INITIAL_DAMAGE, FPS, SPACESHIP_DESTROYED, CollisionShape
 from src.upgrades import UpgradeController
 
 from src.utils import scale_and_rotate, SpriteSheet
 from src.flying_obj import FlyingObject, AnimatedFO
+from src.kinematics import KinematicBody
+from src.pool import Pooled, SpritePool
+from src.trail import ShadowTrail
 
 
 class Spaceship(FlyingObject):
     acceleration: float
 
-    def __init__(self, x, y, sprite_moves):
+    def __init__(self, x, y, sprite_moves, controls):
         image = scale_and_rotate('assets/Sprites/Ships/spaceShips_003.png', .5, 90)
 
         # pygame.transform.gaussian_blur()
@@ -36,11 +39,11 @@ class Spaceship(FlyingObject):
 
         self.gem_auto_pickup_distance = 100
 
-        self.pos_history = Queue()
+        # Positions of the last ticks, the wingmen follow the oldest:
         self.history_len = 6
-        for i in range(self.history_len):
-            self.pos_history.put((x, y))
-        self.last_pos = self.pos_history.get()
+        self.pos_history = deque([(x, y)] * (self.history_len - 1), maxlen=self.history_len - 1)
+        self.last_pos = (x, y)
+        self.trail = ShadowTrail(self.shadow, x, y)
 
         self.thruster_images = {
             pygame.K_s: scale_and_rotate('assets/Sprites/Effects/spaceEffects_002.png'),
@@ -49,6 +52,7 @@ class Spaceship(FlyingObject):
             pygame.K_d: scale_and_rotate('assets/Sprites/Effects/fire18.png', scale_by=1, rotate=90),
             pygame.K_a: scale_and_rotate('assets/Sprites/Effects/spaceEffects_002.png', rotate=-90)}
 
+        self.controls = controls
         self.weapons = WeaponsController(self)
         self.upgrades = UpgradeController(self)
 
@@ -74,8 +78,9 @@ class Spaceship(FlyingObject):
             self.update_positon()
 
         # Store position, get last:
-        self.pos_history.put((self.x, self.y))
-        self.last_pos = self.pos_history.get()
+        self.last_pos = self.pos_history[0]
+        self.pos_history.append((self.x, self.y))
+        self.trail.push(self.x, self.y)
 
         # Wingmen/Shields
         self.weapons.update()
@@ -84,7 +89,7 @@ class Spaceship(FlyingObject):
         super().update_hit_image()
 
     def apply_acceleration(self):
-        keys = pygame.key.get_pressed()
+        keys = self.controls.pressed()
         idle = True
         if keys[pygame.K_a]:
             idle = False
@@ -127,7 +132,7 @@ class Spaceship(FlyingObject):
             self.speed_y = -self.max_speed
 
     def draw(self, draw_window):
-        keys = pygame.key.get_pressed()
+        keys = self.controls.pressed()
 
         # Thrusters:
         if self.health > 0:
@@ -144,12 +149,7 @@ class Spaceship(FlyingObject):
                 draw_window.blit(self.thruster_images[pygame.K_s], (self.rect.x - 2, self.rect.y - 30))
 
             # Spaceship:
-            alpha = 10
-            for idx, pos in enumerate(self.pos_history.queue):  # shadow
-                # if idx % 2 == 0:
-                self.shadow.set_alpha(alpha)
-                draw_window.blit(self.shadow, self.shadow.get_rect(center=pos))
-                alpha += 10
+            self.trail.draw(draw_window)
             draw_window.blit(self.image, self.rect.topleft)
 
         # Weapons:
@@ -162,12 +162,17 @@ class Spaceship(FlyingObject):
         pygame.event.post(pygame.Event(SPACESHIP_DESTROYED))
 
 
-class Missile(AnimatedFO):
+class Missile(Pooled, KinematicBody, AnimatedFO):
+    collision_shape = CollisionShape.RECT
+
     def __init__(self, missile_img, x, y, speed_x=3.0, speed_y=0.0, accel_x=0.1, damage=3):
         super().__init__(missile_img, 4, x, y, speed_x, speed_y, accel_x=accel_x)
         self.damage = damage
 
 
+missile_pool = SpritePool(Missile)
+
+
 class WingMan(FlyingObject):
     def __init__(self, wingman_img, x_offset, y_offset, spaceship, firing_speed=100):
         super().__init__(wingman_img, spaceship.x, spaceship.y, hit_color=(255, 0, 0, 100))
@@ -193,6 +198,8 @@ class WingMan(FlyingObject):
 
 
 class RotatingShield(FlyingObject):
+    collision_shape = CollisionShape.CIRCLE
+
     def __init__(self, rotating_shield_img, spaceship, angle, max_radius, health=10, radius_speed=1, rotation_speed=6):
         super().__init__(rotating_shield_img, spaceship.x, spaceship.y, health=health)
         self.spaceship = spaceship
@@ -212,14 +219,20 @@ class RotatingShield(FlyingObject):
         self.rect.center = round(self.x), round(self.y)
 
 
-class Projectile(FlyingObject):
+class Projectile(Pooled, KinematicBody, FlyingObject):
+    collision_shape = CollisionShape.CIRCLE
 
     def __init__(self, image, x, y, speed_x=12.0, speed_y=0.0, damage=1):
         super().__init__(image, x, y, speed_x, speed_y)
         self.damage = damage
 
 
+projectile_pool = SpritePool(Projectile)
+
+
 class Shield(FlyingObject):
+    collision_shape = CollisionShape.CIRCLE
+
     def __init__(self, spaceship):
         self.frames = {
             idx: scale_and_rotate(f"assets/Sprites/Effects/shield{idx}.png", scale_by=0.8, rotate=-90) for idx in [1, 2, 3]
@@ -349,7 +362,7 @@ class WeaponsController:
         self.fire_cooldown_time *= 0.8 * self.bursts / (self.bursts - 1)
 
     def wingman_fire(self, x, y):
-        self.projectiles.add(Missile(self.missile_img, x + 10, y))
+        self.projectiles.add(missile_pool.acquire(self.missile_img, x + 10, y))
 
     def update(self):
         self.wingmen.update()
@@ -413,8 +426,8 @@ class WeaponsController:
         rect = self.spaceship.rect
         image = self.projectile_imgs[round((90 - angle) % 360)]
 
-        projectile = Projectile(image, rect.right - 10, rect.y + rect.height // 2,
-                                speed_x=speed_x, speed_y=speed_y)
+        projectile = projectile_pool.acquire(image, rect.right - 10, rect.y + rect.height // 2,
+                                             speed_x=speed_x, speed_y=speed_y)
         if self.spaceship.speed_x > 0:
             projectile.speed_x += self.spaceship.speed_x
         projectile.speed_y += self.spaceship.speed_y / 4
@@ -0,0 +1,126 @@
+import numpy as np
+
+FIELDS = ('x', 'y', 'vx', 'vy', 'ax', 'ay', 'px', 'py')
+
+
+class KinematicsStore:
+    """
+    Struct-of-arrays storage for the position, speed and acceleration of the plain moving objects (projectiles,
+    bullets, asteroids, gems, planets). Each body owns a slot; the bodies whose update ran this frame are integrated
+    together by step(), which also syncs their rects.
+    """
+
+    def __init__(self, capacity=256):
+        for name in FIELDS:
+            setattr(self, name, np.zeros(capacity))
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.pending = np.zeros(capacity, dtype=bool)
+        self.bodies = [None] * capacity
+        self.free = list(range(capacity - 1, -1, -1))
+
+    def grow(self):
+        capacity = len(self.bodies)
+        for name in FIELDS + ('alive', 'pending'):
+            array = getattr(self, name)
+            setattr(self, name, np.concatenate([array, np.zeros_like(array)]))
+        self.bodies.extend([None] * capacity)
+        self.free.extend(range(2 * capacity - 1, capacity - 1, -1))
+
+    def register(self, body):
+        if not self.free:
+            self.grow()
+        slot = self.free.pop()
+        for name in FIELDS:
+            getattr(self, name)[slot] = 0.0
+        self.alive[slot] = True
+        self.bodies[slot] = body
+        return slot
+
+    def release(self, slot):
+        # Returns the last values of the slot, so the body can still be read after being killed:
+        values = {name: getattr(self, name).item(slot) for name in FIELDS}
+        self.alive[slot] = False
+        self.pending[slot] = False
+        self.bodies[slot] = None
+        self.free.append(slot)
+        return values
+
+    def clear(self):
+        # Kills every body, so that none is left in a group (e.g. the background planets) without its slot:
+        for slot in np.flatnonzero(self.alive).tolist():
+            self.bodies[slot].kill()
+
+    def step(self):
+        # Same integration as FlyingObject.update_positon, for all the pending bodies at once:
+        moving = np.flatnonzero(self.pending)
+        if len(moving) == 0:
+            return
+        self.pending[moving] = False
+        self.px[moving] = self.x[moving]
+        self.py[moving] = self.y[moving]
+        self.vx[moving] += self.ax[moving]
+        self.vy[moving] += self.ay[moving]
+        self.x[moving] += self.vx[moving]
+        self.y[moving] += self.vy[moving]
+
+        centers_x = np.rint(self.x[moving]).astype(int).tolist()
+        centers_y = np.rint(self.y[moving]).astype(int).tolist()
+        bodies = self.bodies
+        for slot, center_x, center_y in zip(moving.tolist(), centers_x, centers_y):
+            bodies[slot].rect.center = center_x, center_y
+
+
+kinematics = KinematicsStore()
+
+
+class StoredField:
+    # Attribute of a KinematicBody kept in one of the store arrays
+    def __init__(self, field):
+        self.field = field
+
+    def __get__(self, body, owner=None):
+        if body is None:
+            return self
+        if body.slot is None:
+            return body.released[self.field]
+        return getattr(kinematics, self.field).item(body.slot)
+
+    def __set__(self, body, value):
+        if body.slot is None:
+            body.released[self.field] = value
+        else:
+            getattr(kinematics, self.field)[body.slot] = value
+
+
+class KinematicBody:
+    """
+    Mixin for FlyingObject subclasses that only move with their speed and acceleration: the attributes are views
+    over the kinematics store and update_positon just schedules the body for the next kinematics.step().
+    """
+    x = StoredField('x')
+    y = StoredField('y')
+    speed_x = StoredField('vx')
+    speed_y = StoredField('vy')
+    accel_x = StoredField('ax')
+    accel_y = StoredField('ay')
+    prev_x = StoredField('px')
+    prev_y = StoredField('py')
+
+    def __init__(self, *args, **kwargs):
+        # A pooled body gets a new slot when it's initialized again:
+        if getattr(self, 'slot', None) is None:
+            self.slot = kinematics.register(self)
+        super().__init__(*args, **kwargs)
+
+    def update_positon(self):
+        if self.slot is not None:
+            kinematics.pending[self.slot] = True
+
+    def release_slot(self):
+        if self.slot is not None:
+            self.released = kinematics.release(self.slot)
+            self.slot = None
+
+    def kill(self):
+        super().kill()
+        self.release_slot()
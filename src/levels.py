@@ -3,6 +3,7 @@ from dataclasses import dataclass, field
 import pygame
 
 from src.constants import EnemySpawnEvent, NEXT_LEVEL_EVENT
+from src.timers import event_timers
 
 LEVEL_TIMER = 20000
 BETWEEN_LEVEL_PAUSE = 5000
@@ -25,13 +26,13 @@ class LevelController:
         event_id = event_enum.value
         if spawn_time:
             print(event_enum, kwargs)
-        pygame.time.set_timer(pygame.event.Event(event_id, **kwargs), spawn_time)
+        event_timers.set_timer(pygame.event.Event(event_id, **kwargs), spawn_time)
 
     def activate_next_level(self):
         # Pause between levels:
         if self.level_pause:
             self.deactivate_all_enemy_events()
-            pygame.time.set_timer(NEXT_LEVEL_EVENT, self.levels[self.current_level].end_pause)
+            event_timers.set_timer(NEXT_LEVEL_EVENT, self.levels[self.current_level].end_pause)
             self.level_pause = False
             return
 
@@ -39,7 +40,7 @@ class LevelController:
         self.level_pause = True
         self.current_level += 1
 
-        pygame.time.set_timer(NEXT_LEVEL_EVENT, self.levels[self.current_level].duration)
+        event_timers.set_timer(NEXT_LEVEL_EVENT, self.levels[self.current_level].duration)
         if self.current_level < len(self.levels):
             for event_enum, spawn_time, kwargs in self.levels[self.current_level].spawn_functions:
                 self.activate_event(event_enum, *spawn_time, **kwargs)
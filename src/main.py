@@ -1,21 +1,83 @@
+import argparse
 import sys
 
 import pygame
 
+from src.assets import derived_images, text_cache
 from src.basegame import Game
-from src.constants import GameState, FPS
+from src.collision import set_collision_precision
+from src.controls import KeyboardInput
+from src.replay import ReplayPlayer, ReplayRecorder
+from src.pool import SpritePool
+from src.profiler import profiler
+from src.tracing import tracer
+from src.renderer import present
+from src.constants import GameState, FPS, COLLISION_BACKEND, CollisionBackend, COLLISION_PRECISION, \
+    CollisionPrecision, RENDER_SCALING, RenderScaling
 
 if __name__ == "__main__":
-    game = Game()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--collision", choices=[backend.value for backend in CollisionBackend],
+                        default=COLLISION_BACKEND.value, help="broad phase for projectile/shield hits")
+    parser.add_argument("--precision", choices=[precision.value for precision in CollisionPrecision],
+                        default=COLLISION_PRECISION.value, help="collision accuracy vs speed")
+    parser.add_argument("--dirty-rects", action="store_true",
+                        help="only redraw the changed regions while the background stands still")
+    parser.add_argument("--render-size", metavar="WIDTHxHEIGHT",
+                        help="draw and play at this resolution, scaled to the window (a replay sets its own)")
+    parser.add_argument("--scaling", choices=[scaling.value for scaling in RenderScaling],
+                        default=RENDER_SCALING.value, help="scaling of the render size to the window")
+    parser.add_argument("--profile", metavar="FILE", help="write the stage timings of every frame to a CSV or JSON file")
+    parser.add_argument("--trace", type=int, metavar="FRAMES", help="record a Chrome trace of the first FRAMES frames")
+    parser.add_argument("--trace-cprofile", action="store_true",
+                        help="also run cProfile during the traces (this one and the ones started with F4)")
+    parser.add_argument("--seed", type=int, help="seed of the game randomness")
+    parser.add_argument("--record", metavar="FILE", help="record the inputs to a replay file")
+    parser.add_argument("--replay", metavar="FILE", help="play the inputs of a replay file")
+    args = parser.parse_args()
+
+    set_collision_precision(CollisionPrecision(args.precision))
+
+    seed, window_size, controls = args.seed, None, KeyboardInput()
+    render_size = tuple(map(int, args.render_size.split('x'))) if args.render_size else None
+    if args.replay:
+        controls = ReplayPlayer(args.replay)
+        seed, window_size, render_size = controls.seed, controls.window_size, None
+    if args.record:
+        controls = ReplayRecorder(controls)
+
+    game = Game(collision_backend=CollisionBackend(args.collision), controls=controls, window_size=window_size,
+                seed=seed, dirty_rects=args.dirty_rects, render_size=render_size, scaling=RenderScaling(args.scaling))
+    game.trace_cprofile = args.trace_cprofile
+    # Every frame is kept for the dump:
+    profiler.keep_frames = bool(args.profile)
+    if args.trace:
+        tracer.start(args.trace, with_cprofile=args.trace_cprofile)
     dt = 0.0
 
     while game.state() != GameState.QUIT:
         game.manage_game_state(dt)
         # Update the display
-        pygame.display.flip()
+        profiler.begin('flip')
+        present(game.renderer, game.scaled_display)
+        profiler.end('flip')
+        profiler.end_frame(**game.entity_counts())
 
         # Cap the frame rate
-        dt = game.clock.tick(FPS) / 1000.0  # Divide by 1000.0 to get dt (time_passed) in seconds
+        with tracer.span('clock.tick', 'frame'):
+            dt = game.clock.tick(FPS) / 1000.0  # Divide by 1000.0 to get dt (time_passed) in seconds
+        tracer.end_frame()
+
+    if args.record:
+        controls.save(args.record, game)
+    tracer.finish()
+    if args.profile:
+        profiler.dump(args.profile)
+    print(derived_images)
+    print(text_cache)
+    print(SpritePool.report())
+    if game.renderer is not None:
+        print(game.renderer)
 
     # Quit Pygame
     pygame.quit()
@@ -1,6 +1,6 @@
 import pytweening
 
-from constants import FPS
+from src.constants import FPS
 
 
 class SpriteMoves:
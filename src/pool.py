@@ -0,0 +1,59 @@
+from src.constants import SPRITE_POOL_SIZE
+
+
+class SpritePool:
+    """
+    Recycles killed sprites of one class: acquire() initializes a free sprite again instead of allocating a new one.
+    """
+    pools = []
+
+    def __init__(self, sprite_class, max_size=SPRITE_POOL_SIZE):
+        self.sprite_class = sprite_class
+        self.max_size = max_size
+        self.free = []
+        self.created = 0
+        self.reused = 0
+        self.dropped = 0
+        SpritePool.pools.append(self)
+
+    def acquire(self, *args, **kwargs):
+        if self.free:
+            sprite = self.free.pop()
+            sprite.reinit(*args, **kwargs)
+            self.reused += 1
+        else:
+            sprite = self.sprite_class(*args, **kwargs)
+            sprite.pool = self
+            self.created += 1
+        return sprite
+
+    def release(self, sprite):
+        if len(self.free) < self.max_size:
+            self.free.append(sprite)
+        else:
+            self.dropped += 1
+
+    def __str__(self):
+        return (f"{self.sprite_class.__name__} pool: {self.created} created, {self.reused} reused, "
+                f"{self.dropped} dropped, {len(self.free)} free")
+
+    @staticmethod
+    def report():
+        return "\n".join(str(pool) for pool in SpritePool.pools)
+
+
+class Pooled:
+    """
+    Mixin for sprites handed out by a SpritePool: killing the sprite gives it back to its pool.
+    """
+    pool = None
+
+    def reinit(self, *args, **kwargs):
+        # Same object, fresh state (the expensive image work is cached)
+        self.__init__(*args, **kwargs)
+
+    def kill(self):
+        was_alive = self.alive()
+        super().kill()
+        if was_alive and self.pool is not None:
+            self.pool.release(self)
@@ -0,0 +1,123 @@
+import csv
+import json
+import time
+from collections import deque
+
+import pygame
+
+from src.assets import derived_images, text_cache
+from src.constants import FPS, PROFILER_WINDOW
+from src.tracing import tracer
+
+
+class FrameProfiler:
+    """
+    High resolution timers for the stages of a frame (the same stage run by several ticks of one frame adds up).
+    The last frames are kept for the rolling averages of the overlay, and every frame only when keep_frames is set
+    (for a dump on exit or a benchmark). The hit
+    rates of the watched caches (anything with hits and misses counters) are shown over the same frames.
+    """
+
+    def __init__(self, window=PROFILER_WINDOW):
+        self.window = window
+        self.stages = []
+        self.rolling = {}
+        self.started = {}
+        self.current = {}
+        self.frames = []
+        self.keep_frames = False
+        self.counts = {}
+        self.overlay = False
+        self.font = None
+        self.panel_rect = None
+        self.caches = {}
+
+    def begin(self, stage):
+        tracer.begin(stage, 'stage')
+        self.started[stage] = time.perf_counter()
+
+    def end(self, stage):
+        elapsed = time.perf_counter() - self.started[stage]
+        self.current[stage] = self.current.get(stage, 0.0) + elapsed
+        tracer.end(stage, 'stage')
+
+    def end_frame(self, **counts):
+        # Closes the frame, counts are the entities to show along the timings
+        for stage in self.current:
+            if stage not in self.rolling:
+                self.stages.append(stage)
+                self.rolling[stage] = deque(maxlen=self.window)
+        for stage in self.stages:
+            self.rolling[stage].append(self.current.get(stage, 0.0))
+        if self.keep_frames:
+            self.frames.append(self.current)
+        self.current = {}
+        self.counts = counts
+        for cache, samples in self.caches.values():
+            samples.append((cache.hits, cache.misses))
+
+    def clear(self):
+        overlay, keep_frames, caches = self.overlay, self.keep_frames, self.caches
+        self.__init__(self.window)
+        self.overlay = overlay
+        self.keep_frames = keep_frames
+        for name, (cache, samples) in caches.items():
+            self.watch_cache(name, cache)
+
+    def watch_cache(self, name, cache):
+        self.caches[name] = cache, deque([(cache.hits, cache.misses)], maxlen=self.window + 1)
+
+    def hit_rate(self, name):
+        # Over the last frames, None without lookups
+        samples = self.caches[name][1]
+        (hits_before, misses_before), (hits, misses) = samples[0], samples[-1]
+        lookups = hits + misses - hits_before - misses_before
+        return (hits - hits_before) / lookups if lookups else None
+
+    def mean_ms(self, stage):
+        samples = self.rolling[stage]
+        return 1000 * sum(samples) / len(samples)
+
+    def max_ms(self, stage):
+        return 1000 * max(self.rolling[stage])
+
+    def draw(self, window):
+        if self.font is None:
+            self.font = pygame.font.SysFont('monospace', 15)
+        budget = 1000 / FPS
+        total = sum(self.mean_ms(stage) for stage in self.stages)
+        rows = [(('stage', 'mean', 'max'), 'gray70')]
+        rows.extend(((stage, f"{self.mean_ms(stage):.2f}", f"{self.max_ms(stage):.2f}"), 'chartreuse3')
+                    for stage in self.stages)
+        rows.append((('total', f"{total:.2f}", f"/ {budget:.1f}"), 'red' if total > budget else 'chartreuse3'))
+        rows.extend(((name, str(count), ''), 'cadetblue2') for name, count in self.counts.items())
+        for name in self.caches:
+            hit_rate = self.hit_rate(name)
+            rows.append(((name, '-' if hit_rate is None else f"{hit_rate:.0%}", 'hits'), 'gray70'))
+
+        # Name column left aligned, numbers right aligned:
+        line_height = self.font.get_linesize()
+        panel = pygame.Surface((250, line_height * len(rows) + 10), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 160))
+        for idx, (cells, color) in enumerate(rows):
+            y = 5 + line_height * idx
+            for cell, x in zip(cells, (5, 160, 240)):
+                text = self.font.render(cell, True, pygame.Color(color))
+                panel.blit(text, text.get_rect(topleft=(x, y)) if x == 5 else text.get_rect(topright=(x, y)))
+        self.panel_rect = window.blit(panel, (10, 50))
+
+    def dump(self, path):
+        # One row per frame with the ms of each stage, as CSV or JSON depending on the file extension
+        rows = [{stage: round(1000 * frame.get(stage, 0.0), 4) for stage in self.stages} for frame in self.frames]
+        with open(path, 'w', newline='') as file:
+            if path.endswith('.json'):
+                json.dump(dict(stages=self.stages, frames=rows), file)
+            else:
+                writer = csv.DictWriter(file, fieldnames=self.stages)
+                writer.writeheader()
+                writer.writerows(rows)
+
+
+profiler = FrameProfiler()
+profiler.watch_cache('text cache', text_cache)
+profiler.watch_cache('derived images', derived_images)
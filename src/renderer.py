@@ -0,0 +1,121 @@
+import math
+
+import pygame
+
+from src.constants import DIRTY_RECT_MAX_AREA, RENDER_SCALING, RenderScaling
+
+
+class DirtyRectRenderer:
+    """
+    Optional drawing path for the action frames: while the background stands still (no scroll since the last frame,
+    e.g. on the upgrade screen), only the regions of the sprites and the HUD are restored from a copy of the
+    background and sent to the display. Whenever the background moved, or the regions would cover too much of the
+    screen, the frame is drawn and flipped whole as usual.
+    """
+
+    def __init__(self, game):
+        self.game = game
+        self.cache = None
+        self.cache_version = None
+        self.drawn_version = None
+        self.previous = []
+        self.dirty_rects = None
+        self.full_frames = 0
+        self.dirty_frames = 0
+
+    def draw_background(self, regions):
+        """
+        Draws the background under this frame's regions (rects of everything drawn on top of it), the whole window
+        if it has to be repainted.
+        """
+        window = self.game.window
+        background = self.game.background
+        if background.version != self.cache_version:
+            background.draw()
+            # Second frame in a row with the same background, worth keeping a copy:
+            if background.version == self.drawn_version:
+                if self.cache is None:
+                    self.cache = window.copy()
+                else:
+                    self.cache.blit(window, (0, 0))
+                self.cache_version = background.version
+            self.drawn_version = background.version
+            self.dirty_rects = None
+        else:
+            screen = window.get_rect()
+            restore = [rect.clip(screen) for rect in regions + self.previous]
+            if sum(rect.width * rect.height for rect in restore) > DIRTY_RECT_MAX_AREA * screen.width * screen.height:
+                window.blit(self.cache, (0, 0))
+                self.dirty_rects = None
+            else:
+                for rect in restore:
+                    window.blit(self.cache, rect, rect)
+                self.dirty_rects = restore
+        self.previous = regions
+
+    def take_dirty_rects(self):
+        # Rects to update on the display for the last frame, None to flip the whole window
+        dirty_rects, self.dirty_rects = self.dirty_rects, None
+        if dirty_rects is None:
+            self.full_frames += 1
+        else:
+            self.dirty_frames += 1
+        return dirty_rects
+
+    def __str__(self):
+        return f"Dirty rects: {self.dirty_frames} partial frames, {self.full_frames} full frames"
+
+
+class ScaledDisplay:
+    """
+    Off-screen surface the game draws at an internal resolution, scaled to the window once per frame. The game
+    coordinates are those of the surface, whatever the window size. Both scalings keep the aspect ratio, with black
+    borders around: nearest uses the largest whole factor fitting the window (the exact fit if the window is the
+    smaller), smooth fills the window.
+    """
+
+    def __init__(self, window, render_size, scaling=RENDER_SCALING):
+        self.window = window
+        self.scaling = scaling
+        self.surface = pygame.Surface(render_size).convert()
+        width, height = render_size
+        factor = min(window.get_width() / width, window.get_height() / height)
+        if scaling == RenderScaling.NEAREST and factor >= 1:
+            factor = math.floor(factor)
+        self.factor = factor
+        target = pygame.Rect(0, 0, round(width * factor), round(height * factor))
+        target.center = window.get_rect().center
+        self.target = window.subsurface(target)
+        window.fill(pygame.Color('black'))
+        pygame.display.flip()
+
+    def present(self, dirty_rects=None):
+        offset_x, offset_y = self.target.get_offset()
+        # Scaled by a whole factor, the dirty rects map to exact rects of the window:
+        if dirty_rects is not None and isinstance(self.factor, int):
+            factor = self.factor
+            updated = []
+            for rect in dirty_rects:
+                if rect.width and rect.height:
+                    target = pygame.Rect(rect.x * factor, rect.y * factor, rect.width * factor, rect.height * factor)
+                    pygame.transform.scale(self.surface.subsurface(rect), target.size, self.target.subsurface(target))
+                    updated.append(target.move(offset_x, offset_y))
+            pygame.display.update(updated)
+            return
+
+        if self.scaling == RenderScaling.SMOOTH:
+            pygame.transform.smoothscale(self.surface, self.target.get_size(), self.target)
+        else:
+            pygame.transform.scale(self.surface, self.target.get_size(), self.target)
+        pygame.display.flip()
+
+
+def present(renderer, scaled_display=None):
+    # Sends the frame to the display, scaled first if drawn at an internal resolution
+    dirty_rects = renderer.take_dirty_rects() if renderer is not None else None
+    if scaled_display is not None:
+        scaled_display.present(dirty_rects)
+    elif dirty_rects is None:
+        pygame.display.flip()
+    else:
+        pygame.display.update(dirty_rects)
@@ -0,0 +1,93 @@
+import json
+
+import pygame
+
+from src.constants import SIM_RATE
+from src.controls import InputSource, ScriptedInput, CONTROL_KEYS
+from src.upgrades import UpgradeType
+
+REPLAY_VERSION = 1
+
+
+class ReplayRecorder(InputSource):
+    """
+    Wraps the input source of a game and records what it gives tick by tick: the held keys (run-length encoded), the
+    key presses and the chosen upgrades. With the game seed, that's all it takes to play the same game again.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.ticks = 0
+        self.held = []
+        self.key_presses = []
+        self.upgrades = []
+
+    def tick(self):
+        self.source.tick()
+        self.ticks += 1
+        pressed = self.source.pressed()
+        keys = [key for key in CONTROL_KEYS if pressed[key]]
+        if self.held and self.held[-1][1] == keys:
+            self.held[-1][0] += 1
+        else:
+            self.held.append([1, keys])
+
+    def pressed(self):
+        return self.source.pressed()
+
+    def events(self, events):
+        events = self.source.events(events)
+        self.key_presses.extend([self.ticks, event.key] for event in events if event.type == pygame.KEYDOWN)
+        return events
+
+    def choose_upgrade(self, events, choices):
+        upgrade = self.source.choose_upgrade(events, choices)
+        if upgrade is not None:
+            self.upgrades.append([self.ticks, upgrade.name])
+        return upgrade
+
+    def save(self, path, game):
+        replay = dict(version=REPLAY_VERSION, seed=game.seed, sim_rate=SIM_RATE, window_size=[game.width, game.height],
+                      ticks=self.ticks, held=self.held, key_presses=self.key_presses, upgrades=self.upgrades)
+        with open(path, 'w') as file:
+            json.dump(replay, file, separators=(',', ':'))
+
+
+class ReplayPlayer(InputSource):
+    """
+    Plays the inputs of a file written by ReplayRecorder. The live keyboard is ignored, except for quitting.
+    """
+
+    def __init__(self, path):
+        with open(path) as file:
+            replay = json.load(file)
+        if replay['version'] != REPLAY_VERSION or replay['sim_rate'] != SIM_RATE:
+            raise ValueError(f"{path}: replay version {replay['version']} at {replay['sim_rate']} ticks/s, "
+                             f"can only play version {REPLAY_VERSION} at {SIM_RATE} ticks/s")
+        self.seed = replay['seed']
+        self.window_size = tuple(replay['window_size'])
+        self.length = replay['ticks']
+        self.held = ScriptedInput(replay['held'], loop=False)
+        self.key_presses = {}
+        for tick, key in replay['key_presses']:
+            self.key_presses.setdefault(tick, []).append(key)
+        self.upgrades = {tick: UpgradeType[name] for tick, name in replay['upgrades']}
+        self.ticks = 0
+
+    def tick(self):
+        self.held.tick()
+        self.ticks += 1
+
+    def pressed(self):
+        return self.held.pressed()
+
+    def finished(self):
+        return self.ticks >= self.length
+
+    def events(self, events):
+        # Recorded key presses first, as they were queued before the timer events of the tick
+        key_presses = [pygame.event.Event(pygame.KEYDOWN, key=key) for key in self.key_presses.pop(self.ticks, [])]
+        return key_presses + [event for event in events if event.type not in (pygame.KEYDOWN, pygame.KEYUP)]
+
+    def choose_upgrade(self, events, choices):
+        return self.upgrades.pop(self.ticks, None)
@@ -0,0 +1,158 @@
+import numpy as np
+
+from src.collision import collision_stats
+from src.kinematics import kinematics
+from src.enemies import Swarmer
+from src.tracing import traced
+from src.utils import narrow_spritecollide
+
+
+class SwarmSystem:
+    """
+    Steers all the swarmers towards their target in one NumPy pass (same behaviour as steering each one on its own):
+    full speed straight at the target, with the image of the closest ANGLE_STEP heading.
+    """
+
+    def __init__(self, swarmers):
+        self.swarmers = swarmers
+
+    def update(self):
+        swarmers = self.swarmers.sprites()
+        if not swarmers:
+            return
+        count = len(swarmers)
+        slots = np.fromiter((swarmer.slot for swarmer in swarmers), dtype=np.intp, count=count)
+        target_x = np.fromiter((swarmer.target.x for swarmer in swarmers), dtype=float, count=count)
+        target_y = np.fromiter((swarmer.target.y for swarmer in swarmers), dtype=float, count=count)
+        speed = np.fromiter((swarmer.speed for swarmer in swarmers), dtype=float, count=count)
+
+        delta_x = target_x - kinematics.x[slots]
+        delta_y = target_y - kinematics.y[slots]
+        factor = speed / np.maximum(np.sqrt(delta_x ** 2 + delta_y ** 2), 1e-9)
+        speed_x = factor * delta_x
+        speed_y = factor * delta_y
+        kinematics.vx[slots] = speed_x
+        kinematics.vy[slots] = speed_y
+
+        # Image angle:
+        step = Swarmer.ANGLE_STEP
+        angle = (np.degrees(np.arctan2(speed_y, speed_x)) // step * step + 90) % 360
+        frame_idx = (angle // step).astype(int).tolist()
+        for swarmer, idx in zip(swarmers, frame_idx):
+            swarmer.image = swarmer.frames[idx]
+
+
+class GemSystem:
+    """
+    Gem magnet and pickup for all the gems at once: a gem starts following the spaceship when it gets within
+    gem_auto_pickup_distance (Manhattan distance) and is picked up when it touches the spaceship.
+    """
+
+    def __init__(self, gems):
+        self.gems = gems
+
+    def update(self, spaceship):
+        gems = self.gems.sprites()
+        if not gems:
+            return
+        count = len(gems)
+        slots = np.fromiter((gem.slot for gem in gems), dtype=np.intp, count=count)
+        following = np.fromiter((gem.is_following for gem in gems), dtype=bool, count=count)
+        follow_speed = np.fromiter((gem.follow_speed for gem in gems), dtype=float, count=count)
+        delta_x = spaceship.x - kinematics.x[slots]
+        delta_y = spaceship.y - kinematics.y[slots]
+
+        # Following gems go straight to the spaceship:
+        follow_slots = slots[following]
+        if len(follow_slots):
+            distance = np.maximum(np.sqrt(delta_x[following] ** 2 + delta_y[following] ** 2), 1e-9)
+            factor = follow_speed[following] / distance
+            kinematics.vx[follow_slots] = factor * delta_x[following]
+            kinematics.vy[follow_slots] = factor * delta_y[following]
+
+        # The others start following once close enough (and move normally this frame):
+        attracted = ~following & (np.abs(delta_x) + np.abs(delta_y) <= spaceship.gem_auto_pickup_distance)
+        for idx in np.flatnonzero(attracted).tolist():
+            gems[idx].is_following = True
+
+    @traced('collision')
+    def pickups(self, spaceship):
+        """
+        Returns the gems touching the spaceship: rect pass over all the gems at once, then the narrow phase of
+        collision.collide_shapes on the candidates, so that pickups follow the collision precision like every
+        other collision.
+        """
+        gems = self.gems.sprites()
+        if not gems:
+            return []
+        hits = [gems[idx] for idx in spaceship.rect.collidelistall([gem.rect for gem in gems])]
+        collision_stats.add_rect_pass(len(gems), len(hits))
+        return narrow_spritecollide(spaceship, hits, False) if hits else []
+
+    @staticmethod
+    def collect(gems):
+        # Returns the total score of the collected gems
+        score = sum(gem.score for gem in gems)
+        for gem in gems:
+            gem.kill()
+        return score
+
+
+class HomingSystem:
+    """
+    Homing bullets: while the target is still ahead (to the left), each bullet accelerates towards it with its
+    homing_accel (never backwards) and its speed is clamped to its max_speed on each axis. Targeted bullets queued
+    with aim() get their initial speed straight at the target.
+    """
+
+    def __init__(self, homing):
+        self.homing = homing
+        self.aim_queue = []
+
+    def aim(self, bullet, target, speed):
+        self.aim_queue.append((bullet, target, speed))
+
+    def update(self):
+        self.update_homing()
+        self.update_aim()
+
+    def update_homing(self):
+        bullets = self.homing.sprites()
+        if not bullets:
+            return
+        count = len(bullets)
+        slots = np.fromiter((bullet.slot for bullet in bullets), dtype=np.intp, count=count)
+        target_x = np.fromiter((bullet.target.x for bullet in bullets), dtype=float, count=count)
+        target_y = np.fromiter((bullet.target.y for bullet in bullets), dtype=float, count=count)
+        max_speed = np.fromiter((bullet.max_speed for bullet in bullets), dtype=float, count=count)
+        homing_accel = np.fromiter((bullet.homing_accel for bullet in bullets), dtype=float, count=count)
+
+        x = kinematics.x[slots]
+        delta_x = target_x - x
+        delta_y = target_y - kinematics.y[slots]
+        distance = np.maximum(np.sqrt(delta_x ** 2 + delta_y ** 2), 1e-9)
+        active = x > target_x
+        accel_x = np.where(active, np.minimum(homing_accel * delta_x / distance, 0), 0)
+        accel_y = np.where(active, homing_accel * delta_y / distance, 0)
+        kinematics.ax[slots] = accel_x
+        kinematics.ay[slots] = accel_y
+        kinematics.vx[slots] = np.where(active, np.clip(kinematics.vx[slots], -max_speed, max_speed),
+                                        kinematics.vx[slots])
+        kinematics.vy[slots] = np.where(active, np.clip(kinematics.vy[slots], -max_speed, max_speed),
+                                        kinematics.vy[slots])
+
+    def update_aim(self):
+        if not self.aim_queue:
+            return
+        bullets, targets, speeds = zip(*self.aim_queue)
+        self.aim_queue = []
+        count = len(bullets)
+        slots = np.fromiter((bullet.slot for bullet in bullets), dtype=np.intp, count=count)
+        target_x = np.fromiter((target.x for target in targets), dtype=float, count=count)
+        target_y = np.fromiter((target.y for target in targets), dtype=float, count=count)
+        speed = np.array(speeds, dtype=float)
+        delta_x = target_x - kinematics.x[slots]
+        delta_y = target_y - kinematics.y[slots]
+        distance = np.maximum(np.sqrt(delta_x ** 2 + delta_y ** 2), 1e-9)
+        kinematics.vx[slots] = speed * (delta_x / distance)
+        kinematics.vy[slots] = speed * (delta_y / distance)
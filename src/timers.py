@@ -0,0 +1,37 @@
+import pygame
+
+from src.constants import SIM_RATE
+
+
+class EventTimers:
+    """
+    Stand-in for pygame.time.set_timer counted in simulation ticks instead of wall clock time: the spawns, level
+    changes and planets follow the simulated time, whether the game runs slower or faster than real time.
+    """
+
+    def __init__(self):
+        # event type -> [event, interval, time left], in ms
+        self.timers = {}
+
+    def set_timer(self, event, millis):
+        # Same semantics as pygame.time.set_timer: one timer per event type, 0 removes it
+        if isinstance(event, int):
+            event = pygame.event.Event(event)
+        if millis > 0:
+            self.timers[event.type] = [event, millis, millis]
+        else:
+            self.timers.pop(event.type, None)
+
+    def clear(self):
+        self.timers.clear()
+
+    def tick(self, millis=1000 / SIM_RATE):
+        # Posts the events that are due, in the order their timers were set
+        for timer in list(self.timers.values()):
+            timer[2] -= millis
+            while timer[2] <= 0:
+                pygame.event.post(timer[0])
+                timer[2] += timer[1]
+
+
+event_timers = EventTimers()
@@ -0,0 +1,32 @@
+from src.constants import SIM_RATE, MAX_SUBSTEPS
+
+
+class FixedTimestep:
+    """
+    Accumulates the real frame time and hands it out as fixed simulation ticks, so the game runs at the same speed
+    whatever the frame rate. After a long frame at most max_substeps ticks are run and the rest of the time is
+    dropped (the game slows down instead of spiralling).
+    """
+
+    def __init__(self, rate=SIM_RATE, max_substeps=MAX_SUBSTEPS):
+        self.step = 1 / rate
+        self.max_substeps = max_substeps
+        self.accumulator = 0.0
+        self.dropped = 0.0
+
+    def advance(self, dt):
+        # Returns the number of ticks to run for a frame of dt seconds
+        self.accumulator += dt
+        ticks = int(self.accumulator / self.step)
+        if ticks > self.max_substeps:
+            self.dropped += (ticks - self.max_substeps) * self.step
+            ticks = self.max_substeps
+            self.accumulator = 0.0
+        else:
+            self.accumulator -= ticks * self.step
+        return ticks
+
+    @property
+    def alpha(self):
+        # How far we are into the next tick, to interpolate the drawing between the last two ticks
+        return min(self.accumulator / self.step, 1.0)
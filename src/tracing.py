@@ -0,0 +1,126 @@
+import cProfile
+import functools
+import json
+import os
+import time
+
+from src.constants import TRACE_FRAMES
+
+
+class TraceRecorder:
+    """
+    Records the spans of the next frames in the Chrome trace_event format (chrome://tracing, ui.perfetto.dev), and
+    optionally runs cProfile over the same frames. A capture starts and stops on frame boundaries, so that all the
+    spans are closed.
+    """
+
+    def __init__(self):
+        self.active = False
+        self.requested = None
+        self.frames_left = 0
+        self.events = []
+        self.path = None
+        self.profile = None
+        self.frames = 0
+        self.frame_count = 0
+
+    def start(self, frames=TRACE_FRAMES, path=None, with_cprofile=False):
+        # The capture begins with the next frame
+        if not self.active:
+            path = path or time.strftime('trace-%Y%m%d-%H%M%S.json')
+            self.requested = frames, path, with_cprofile
+
+    def begin(self, name, category):
+        if self.active:
+            self.events.append(dict(name=name, cat=category, ph='B', ts=time.perf_counter_ns() / 1000, pid=0, tid=0))
+
+    def end(self, name, category):
+        if self.active:
+            self.events.append(dict(name=name, cat=category, ph='E', ts=time.perf_counter_ns() / 1000, pid=0, tid=0))
+
+    def span(self, name, category):
+        # For with blocks
+        return Span(self, name, category) if self.active else NO_SPAN
+
+    def end_frame(self):
+        self.frame_count += 1
+        if self.active:
+            self.end('frame', 'frame')
+            self.frames_left -= 1
+            if self.frames_left <= 0:
+                self.stop()
+        elif self.requested:
+            self.frames, self.path, with_cprofile = self.requested
+            self.frames_left = self.frames
+            self.requested = None
+            self.events = []
+            self.active = True
+            if with_cprofile:
+                self.profile = cProfile.Profile()
+                self.profile.enable()
+        if self.active:
+            self.begin('frame', 'frame')
+            self.events[-1]['args'] = dict(frame=self.frame_count)
+
+    def finish(self):
+        # Ends a capture cut short by quitting the game, the current frame included
+        if self.active:
+            self.end('frame', 'frame')
+            self.stop()
+
+    def stop(self):
+        self.active = False
+        if self.profile is not None:
+            self.profile.disable()
+            self.profile.dump_stats(os.path.splitext(self.path)[0] + '.prof')
+            self.profile = None
+        with open(self.path, 'w') as file:
+            json.dump(dict(traceEvents=self.events, displayTimeUnit='ms'), file)
+        print(f"Trace of {self.frames} frames written to {self.path}")
+        self.events = []
+
+
+class Span:
+    def __init__(self, tracer, name, category):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+
+    def __enter__(self):
+        self.tracer.begin(self.name, self.category)
+
+    def __exit__(self, *exc_info):
+        self.tracer.end(self.name, self.category)
+
+
+class NoSpan:
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NO_SPAN = NoSpan()
+
+tracer = TraceRecorder()
+
+
+def traced(category):
+    """
+    Decorator recording each call of the function as a span, when a capture is active.
+    """
+    def decorate(function):
+        name = function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not tracer.active:
+                return function(*args, **kwargs)
+            tracer.begin(name, category)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                tracer.end(name, category)
+        return wrapper
+    return decorate
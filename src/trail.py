@@ -0,0 +1,90 @@
+import numpy as np
+import pygame
+
+from src.constants import TRAIL_LENGTH, TRAIL_QUALITY, TRAIL_CACHE_SIZE, TrailQuality
+
+
+class ShadowTrail:
+    """
+    Copies of the spaceship shadow along its last positions, the oldest the faintest. The positions are kept in a ring
+    buffer, and the shadow is pre-baked with the alpha of each segment. A trail shape (the offsets between its
+    segments) seen on two frames in a row is merged into a single surface, drawn with one blit for as long as the
+    shape holds, e.g. while the ship stands still or cruises at a steady speed.
+    """
+
+    def __init__(self, shadow, x, y, length=TRAIL_LENGTH, quality=TRAIL_QUALITY):
+        self.shadow = shadow
+        self.positions = [(x, y)] * length
+        self.head = 0
+        # Every segment fades 10 more than the next one:
+        self.variants = []
+        for idx in range(length):
+            variant = shadow.copy()
+            variant.set_alpha(10 * (idx + 1))
+            self.variants.append(variant)
+        self.step = 2 if quality == TrailQuality.HALF else 1
+        self.merged = {}
+        self.last_shape = None
+        self.merges = 0
+
+    def push(self, x, y):
+        self.positions[self.head] = (x, y)
+        self.head = (self.head + 1) % len(self.positions)
+
+    def segments(self):
+        # (segment index, topleft) from the oldest, the newest is always drawn
+        length = len(self.positions)
+        return [(idx, self.shadow.get_rect(center=self.positions[(self.head + idx) % length]).topleft)
+                for idx in range((length - 1) % self.step, length, self.step)]
+
+    def rect(self):
+        rects = [self.shadow.get_rect(topleft=topleft) for idx, topleft in self.segments()]
+        return rects[0].unionall(rects[1:])
+
+    def draw(self, window):
+        segments = self.segments()
+        anchor_x, anchor_y = segments[-1][1]
+        shape = tuple((idx, x - anchor_x, y - anchor_y) for idx, (x, y) in segments)
+        merged = self.merged.pop(shape, None)
+        if merged is None and shape == self.last_shape:
+            if len(self.merged) >= TRAIL_CACHE_SIZE:
+                del self.merged[next(iter(self.merged))]
+            merged = self.merge(shape)
+        self.last_shape = shape
+
+        if merged is None:
+            for idx, topleft in segments:
+                window.blit(self.variants[idx], topleft)
+        else:
+            self.merged[shape] = merged
+            surface, (left, top) = merged
+            window.blit(surface, (anchor_x + left, anchor_y + top))
+
+    def merge(self, shape):
+        """
+        One surface for all the segments of the shape, and its offset from the newest segment. The segments are
+        blended over each other (the oldest first) into a color and an alpha giving the same result drawn at once.
+        """
+        self.merges += 1
+        width, height = self.shadow.get_size()
+        left = min(x for idx, x, y in shape)
+        top = min(y for idx, x, y in shape)
+        size = (max(x for idx, x, y in shape) - left + width, max(y for idx, x, y in shape) - top + height)
+        color = pygame.surfarray.array3d(self.shadow).astype(np.float32)
+        shadow_alpha = pygame.surfarray.array_alpha(self.shadow).astype(np.float32) / 255
+
+        # Colors premultiplied by their alpha, and the part of the background still showing through:
+        premultiplied = np.zeros(size + (3,), dtype=np.float32)
+        transparency = np.ones(size, dtype=np.float32)
+        for idx, x, y in shape:
+            area = slice(x - left, x - left + width), slice(y - top, y - top + height)
+            alpha = shadow_alpha * (self.variants[idx].get_alpha() / 255)
+            premultiplied[area] = color * alpha[..., np.newaxis] + premultiplied[area] * (1 - alpha[..., np.newaxis])
+            transparency[area] *= 1 - alpha
+
+        alpha = 1 - transparency
+        surface = pygame.Surface(size, pygame.SRCALPHA)
+        pygame.surfarray.pixels3d(surface)[...] = np.rint(
+            premultiplied / np.maximum(alpha, 1e-6)[..., np.newaxis]).clip(0, 255).astype(np.uint8)
+        pygame.surfarray.pixels_alpha(surface)[...] = np.rint(alpha * 255).astype(np.uint8)
+        return surface, (left, top)
@@ -1,7 +1,11 @@
 import pygame
 import math
 
+from src.collision import collision_stats, collide_shapes
+from src.tracing import traced
 
+
+@traced('asset')
 def scale_and_rotate(image_path, scale_by=None, rotate=None, size=None):
     image = pygame.image.load(image_path)
     if type(scale_by) == tuple:
@@ -26,24 +30,55 @@ class SpriteSheet:
         return image
 
 
-def group_two_pass_collision(group1, group2, dokilla, dokillb):
-    # Hits: first pass with simple collision, then 2nd pass with mask (mask is expensive)
-    hits = pygame.sprite.groupcollide(group1, group2, False, False)
+@traced('collision')
+def group_two_pass_collision(group1, group2, dokilla, dokillb, broad_phase=None):
+    # Hits: first pass with simple collision, then 2nd pass with shapes/mask (mask is expensive) on the first pass pairs
+    if broad_phase is None:
+        hits = pygame.sprite.groupcollide(group1, group2, False, False)
+    else:
+        hits = broad_phase.groupcollide(group1, group2)
+    collision_stats.add_rect_pass(len(group1) * len(group2), sum(len(g2_hits) for g2_hits in hits.values()))
     if hits:
-        new_group1 = pygame.sprite.Group()
-        new_group2 = pygame.sprite.Group()
-        for g1_hit, g2_hits in hits.items():
-            new_group1.add(g1_hit)
-            for element in g2_hits:
-                new_group2.add(element)
-        return pygame.sprite.groupcollide(group1, group2, dokilla, dokillb, pygame.sprite.collide_mask)
+        return narrow_groupcollide(hits, group2, dokilla, dokillb)
 
 
-def sprite_two_pass_collision(sprite, group, dokill):
-    hits = pygame.sprite.spritecollide(sprite, group, False)
+@traced('collision')
+def sprite_two_pass_collision(sprite, group, dokill, grid=None):
+    if grid is not None and grid.indexes(group):
+        hits = grid.query(sprite.rect, group)
+    else:
+        hits = pygame.sprite.spritecollide(sprite, group, False)
+    collision_stats.add_rect_pass(len(group), len(hits))
     if hits:
-        new_group = pygame.sprite.Group(hits)
-        return pygame.sprite.spritecollide(sprite, new_group, dokill, pygame.sprite.collide_mask)
+        return narrow_spritecollide(sprite, hits, dokill)
+
+
+def narrow_spritecollide(sprite, candidates, dokill):
+    # Same as spritecollide(..., collide_shapes) restricted to the candidates of the rect pass:
+    x, y = sprite.rect.topleft
+    collided = []
+    for other in candidates:
+        other_rect = other.rect
+        if collide_shapes(sprite, other, (other_rect.x - x, other_rect.y - y)):
+            collided.append(other)
+            if dokill:
+                other.kill()
+    collision_stats.add_narrow_pass(len(candidates), len(collided))
+    return collided
+
+
+def narrow_groupcollide(hits, group2, dokilla, dokillb):
+    # Same as groupcollide(..., collide_shapes) restricted to the rect pass pairs in hits:
+    crashed = {}
+    for sprite, candidates in hits.items():
+        if dokillb:  # sprites killed by a previous group1 sprite can't collide anymore
+            candidates = [other for other in candidates if other in group2]
+        collided = narrow_spritecollide(sprite, candidates, dokillb)
+        if collided:
+            crashed[sprite] = collided
+            if dokilla:
+                sprite.kill()
+    return crashed
 
 
 def unit_vector(x1, y1, x2, y2, scale=1):